@@ -0,0 +1,102 @@
+"""
+Кеш отрисованных карточек новостей для главной страницы.
+
+Ключ карточки включает версию, которую сигналы меняют при изменении
+новости или её комментариев; устаревшие карточки вытесняются сами.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'news/card.html'
+VERSION_KEY = 'news-card-version:{pk}'
+CARD_KEY = 'news-card:{pk}:{version}'
+HITS_KEY = 'news-card-stats:hits'
+MISSES_KEY = 'news-card-stats:misses'
+
+
+def get_cache():
+    return caches[settings.NEWS_CARD_CACHE]
+
+
+def _new_version():
+    # Версия — момент изменения в наносекундах, поэтому она уникальна.
+    return time.time_ns()
+
+
+def invalidate(news_id):
+    """Меняет версию карточки новости; старая версия больше не читается."""
+    get_cache().set(
+        VERSION_KEY.format(pk=news_id), _new_version(), timeout=None
+    )
+
+
+def get_versions(news_ids, cache=None):
+    """Версии новостей по id; отсутствующие в кеше создаются заново."""
+    cache = cache or get_cache()
+    keys = {pk: VERSION_KEY.format(pk=pk) for pk in news_ids}
+    found = cache.get_many(keys.values())
+    versions = {}
+    missing = {}
+    for pk, key in keys.items():
+        if key in found:
+            versions[pk] = found[key]
+        else:
+            versions[pk] = missing[key] = _new_version()
+    if missing:
+        cache.set_many(missing, timeout=None)
+    return versions
+
+
+def _count(cache, key, delta):
+    if not delta:
+        return
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Ключ успел вытесниться между add и incr — счётчик просто
+        # начнётся заново.
+        cache.set(key, delta, timeout=None)
+
+
+def render_cards(news_list):
+    """
+    Возвращает HTML карточек в порядке news_list.
+
+    Обращения к кешу идут пакетами: версии и карточки читаются
+    одним get_many каждая, промахи дописываются одним set_many.
+    """
+    cache = get_cache()
+    versions = get_versions([news.pk for news in news_list], cache)
+    keys = {
+        news.pk: CARD_KEY.format(pk=news.pk, version=versions[news.pk])
+        for news in news_list
+    }
+    cached = cache.get_many(keys.values())
+    cards = []
+    rendered = {}
+    for news in news_list:
+        key = keys[news.pk]
+        if key in cached:
+            cards.append(mark_safe(cached[key]))
+            continue
+        rendered[key] = render_to_string(CARD_TEMPLATE, {'news': news})
+        cards.append(rendered[key])
+    if rendered:
+        cache.set_many(rendered, timeout=settings.NEWS_CARD_CACHE_TIMEOUT)
+    _count(cache, HITS_KEY, len(cached))
+    _count(cache, MISSES_KEY, len(rendered))
+    return cards
+
+
+def stats():
+    """Счётчики попаданий и промахов кеша карточек."""
+    values = get_cache().get_many((HITS_KEY, MISSES_KEY))
+    return {
+        'hits': values.get(HITS_KEY, 0),
+        'misses': values.get(MISSES_KEY, 0),
+    }
@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
 from .models import Comment
+from .profanity import WordList
 
 BAD_WORDS = (
     'редиска',
@@ -10,6 +12,13 @@ BAD_WORDS = (
 )
 WARNING = 'Не ругайтесь!'
 
+# Словарь модераторов из BAD_WORDS_FILE; без файла — слова выше.
+bad_words = WordList(
+    settings.BAD_WORDS_FILE,
+    default=BAD_WORDS,
+    check_interval=settings.BAD_WORDS_CHECK_INTERVAL,
+)
+
 
 class CommentForm(ModelForm):
 
@@ -20,8 +29,6 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if bad_words.search(text):
+            raise ValidationError(WARNING)
         return text
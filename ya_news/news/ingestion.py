@@ -0,0 +1,207 @@
+"""
+Пакетная запись комментариев одним потоком-писателем.
+
+При всплеске комментариев каждый запрос не держит блокировку SQLite
+своей транзакцией: проверенные комментарии кладутся в очередь, а поток
+записывает их пачками через bulk_create. Если режим выключен, писатель
+не запущен или очередь переполнена, комментарий сохраняется сразу.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from . import cards
+from .models import Comment, News
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class CommentIngestion:
+    """Очередь комментариев и поток, который пишет их пачками."""
+
+    def __init__(self, batch_size=100, flush_interval=0.05, max_queue=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name='comment-ingestion', daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout=5):
+        """Останавливает писателя, дописав всё, что осталось в очереди."""
+        if self.running:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self.flush()
+
+    def submit(self, comment):
+        """
+        Ставит комментарий в очередь на запись.
+
+        Возвращает False, если комментарий нужно сохранить синхронно.
+        """
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(comment)
+        except queue.Full:
+            with self._lock:
+                self._stats['rejected'] += 1
+            return False
+        with self._lock:
+            self._stats['queued'] += 1
+            self._stats['max_depth'] = max(
+                self._stats['max_depth'], self._queue.qsize()
+            )
+        return True
+
+    def flush(self):
+        """Записывает всё, что есть в очереди, в текущем потоке."""
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def stats(self):
+        """Глубина очереди и размеры записанных пачек."""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats.get('batches', 0)
+        stats['depth'] = self._queue.qsize()
+        stats['avg_batch'] = (
+            stats.get('written', 0) / batches if batches else 0
+        )
+        return stats
+
+    def _run(self):
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self.flush_interval
+                # После _STOP пачку не добираем: stop() ждёт недолго.
+                while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=timeout))
+                    except queue.Empty:
+                        break
+                stop = _STOP in batch
+                batch = [item for item in batch if item is not _STOP]
+                if batch:
+                    close_old_connections()
+                    self._write(batch)
+                if stop:
+                    return
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _save(comments):
+        with transaction.atomic():
+            Comment.objects.bulk_create(comments)
+            counts = Counter(comment.news_id for comment in comments)
+            for news_id, count in counts.items():
+                News.objects.filter(pk=news_id).shift_comment_count(count)
+
+    def _save_one_by_one(self, batch):
+        """
+        Записывает комментарии по одному после ошибки в пачке.
+
+        Пользователи уже получили ответ об успехе, поэтому из-за одной
+        плохой строки теряется только она, а не вся пачка.
+        """
+        written = []
+        for comment in batch:
+            try:
+                self._save([comment])
+            except Exception:
+                logger.exception(
+                    'Комментарий отброшен: news_id=%s, author_id=%s',
+                    comment.news_id, comment.author_id
+                )
+            else:
+                written.append(comment)
+        return written
+
+    def _write(self, batch):
+        try:
+            self._save(batch)
+            written = batch
+        except Exception:
+            logger.exception(
+                'Не удалось записать пачку из %s комментариев, '
+                'записываю по одному', len(batch)
+            )
+            written = self._save_one_by_one(batch)
+        # bulk_create не отправляет post_save, карточки сбрасываем сами.
+        for news_id in {comment.news_id for comment in written}:
+            cards.invalidate(news_id)
+        with self._lock:
+            self._stats['failed'] += len(batch) - len(written)
+            self._stats['batches'] += 1
+            self._stats['written'] += len(written)
+            self._stats['last_batch'] = len(batch)
+            self._stats['max_batch'] = max(
+                self._stats['max_batch'], len(batch)
+            )
+        logger.debug(
+            'Записано %s комментариев из пачки в %s', len(written), len(batch)
+        )
+
+
+_ingestion = None
+_ingestion_lock = threading.Lock()
+
+
+def get_ingestion():
+    """Общая для процесса очередь; None, если режим выключен."""
+    global _ingestion
+    if not settings.COMMENT_INGESTION_ENABLED:
+        return None
+    with _ingestion_lock:
+        if _ingestion is None:
+            _ingestion = CommentIngestion(
+                batch_size=settings.COMMENT_INGESTION_BATCH_SIZE,
+                flush_interval=settings.COMMENT_INGESTION_FLUSH_INTERVAL,
+                max_queue=settings.COMMENT_INGESTION_QUEUE_SIZE,
+            )
+            _ingestion.start()
+    return _ingestion
+
+
+def submit(comment):
+    """Ставит комментарий в очередь, если пакетный режим включён."""
+    ingestion = get_ingestion()
+    return ingestion is not None and ingestion.submit(comment)
@@ -0,0 +1,149 @@
+import asyncio
+import io
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+
+HOST = '127.0.0.1'
+# Режим: (обработчик, асинхронные варианты представлений).
+MODES = {
+    'wsgi': ('wsgi', False),
+    'asgi-sync': ('asgi', False),
+    'asgi-async': ('asgi', True),
+}
+
+
+def wsgi_request(handler, path):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'HTTP_HOST': HOST,
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+    statuses = []
+    response = handler(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_request(handler, path):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': b'',
+        'headers': [(b'host', HOST.encode())],
+        'server': (HOST, 80),
+    }
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await handler(scope, receive, send)
+    return statuses[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность WSGI и ASGI при одновременных '
+        'клиентах: обработчики Django вызываются в процессе, без сервера. '
+        'Каждый режим запускается в отдельном процессе на текущей базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument(
+            '--mode', choices=MODES,
+            help='Запустить один режим в этом процессе.'
+        )
+
+    def handle(self, *args, **options):
+        if options['mode']:
+            self._run_mode(options)
+            return
+        for mode, (_, async_views) in MODES.items():
+            environment = dict(
+                os.environ, DJANGO_ASYNC_VIEWS='1' if async_views else '0'
+            )
+            completed = subprocess.run(
+                [
+                    sys.executable, sys.argv[0], 'bench_handlers',
+                    '--mode', mode,
+                    '--path', options['path'],
+                    '--requests', str(options['requests']),
+                    '--concurrency', str(options['concurrency']),
+                ],
+                env=environment, capture_output=True, text=True,
+            )
+            if completed.returncode:
+                raise CommandError(completed.stderr)
+            self.stdout.write(completed.stdout.strip())
+
+    def _run_mode(self, options):
+        mode = options['mode']
+        handler_type, async_views = MODES[mode]
+        if settings.ASYNC_VIEWS != async_views:
+            raise CommandError(
+                f'Для режима {mode} задайте '
+                f'DJANGO_ASYNC_VIEWS={int(async_views)}.'
+            )
+        path = options['path']
+        total = options['requests']
+        concurrency = options['concurrency']
+        if handler_type == 'wsgi':
+            handler = WSGIHandler()
+            started = time.monotonic()
+            with ThreadPoolExecutor(concurrency) as pool:
+                statuses = list(pool.map(
+                    lambda _: wsgi_request(handler, path), range(total)
+                ))
+        else:
+            handler = ASGIHandler()
+            started = time.monotonic()
+            statuses = asyncio.run(
+                self._asgi_load(handler, path, total, concurrency)
+            )
+        elapsed = time.monotonic() - started
+        failed = sum(status >= 400 for status in statuses)
+        self.stdout.write(
+            f'{mode:<10} {total / elapsed:8.1f} запросов/с, '
+            f'ошибок: {failed} из {total}'
+        )
+
+    @staticmethod
+    async def _asgi_load(handler, path, total, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                return await asgi_request(handler, path)
+
+        return await asyncio.gather(*(request() for _ in range(total)))
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from yacommon.sqlite import apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE comment ('
+    'id INTEGER PRIMARY KEY, news_id INTEGER NOT NULL, text TEXT NOT NULL)',
+    'CREATE INDEX comment_news_idx ON comment (news_id, id)',
+)
+NEWS_COUNT = 100
+
+
+class Worker(threading.Thread):
+    """Повторяет операцию до остановки, считая успехи и блокировки."""
+
+    def __init__(self, path, pragmas, persistent, operation, stop):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.operation = operation
+        self.stop = stop
+        self.done = 0
+        self.locked = 0
+        self.slowest = 0.0
+
+    def connect(self):
+        # Таймаут модуля sqlite3 по умолчанию, как у Django без OPTIONS.
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        apply_pragmas(connection.cursor(), self.pragmas)
+        return connection
+
+    def run(self):
+        connection = self.connect() if self.persistent else None
+        number = 0
+        while not self.stop.is_set():
+            number += 1
+            started = time.monotonic()
+            current = connection or self.connect()
+            try:
+                self.operation(current, number)
+                self.done += 1
+            except sqlite3.OperationalError:
+                self.locked += 1
+            finally:
+                if connection is None:
+                    current.close()
+            self.slowest = max(self.slowest, time.monotonic() - started)
+        if connection is not None:
+            connection.close()
+
+
+def read(connection, number):
+    connection.execute(
+        'SELECT id, text FROM comment WHERE news_id = ? '
+        'ORDER BY id DESC LIMIT 50', (number % NEWS_COUNT,)
+    ).fetchall()
+
+
+def write(connection, number):
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        connection.execute(
+            'INSERT INTO comment (news_id, text) VALUES (?, ?)',
+            (number % NEWS_COUNT, 'Текст комментария ' * 10)
+        )
+        connection.execute('COMMIT')
+    except sqlite3.Error:
+        connection.execute('ROLLBACK')
+        raise
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест SQLite: читатели и писатели комментариев '
+        'одновременно во временной базе. Сравнивает настройки по '
+        'умолчанию (журнал отката, соединение на операцию) с SQLITE_PRAGMAS '
+        'и постоянными соединениями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--rows', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        modes = (
+            ('по умолчанию', {}, False),
+            ('настроенная', settings.SQLITE_PRAGMAS, True),
+        )
+        for name, pragmas, persistent in modes:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self._prepare(path, options['rows'])
+                self._run(name, path, pragmas, persistent, options)
+
+    @staticmethod
+    def _prepare(path, rows):
+        connection = sqlite3.connect(path)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.executemany(
+            'INSERT INTO comment (news_id, text) VALUES (?, ?)',
+            ((number % NEWS_COUNT, 'Текст') for number in range(rows))
+        )
+        connection.commit()
+        connection.close()
+
+    def _run(self, name, path, pragmas, persistent, options):
+        stop = threading.Event()
+        readers = [
+            Worker(path, pragmas, persistent, read, stop)
+            for _ in range(options['readers'])
+        ]
+        writers = [
+            Worker(path, pragmas, persistent, write, stop)
+            for _ in range(options['writers'])
+        ]
+        for worker in readers + writers:
+            worker.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for worker in readers + writers:
+            worker.join()
+        seconds = options['seconds']
+        self.stdout.write(
+            f'{name}: чтений {self._rate(readers, seconds)}/с, '
+            f'записей {self._rate(writers, seconds)}/с, '
+            f'блокировок {sum(w.locked for w in readers + writers)}, '
+            'худшее чтение '
+            f'{max(w.slowest for w in readers) * 1000:.0f} мс'
+        )
+
+    @staticmethod
+    def _rate(workers, seconds):
+        return f'{sum(worker.done for worker in workers) / seconds:.0f}'
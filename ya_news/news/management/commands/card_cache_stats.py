@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from news import cards
+
+
+class Command(BaseCommand):
+    help = 'Выводит счётчики попаданий и промахов кеша карточек новостей.'
+
+    def handle(self, *args, **options):
+        stats = cards.stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f'Попаданий: {stats["hits"]}, промахов: {stats["misses"]}, '
+            f'доля попаданий: {ratio:.1%}'
+        )
@@ -0,0 +1,199 @@
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from news.models import News
+
+FORMATS = ('jsonl', 'csv')
+
+
+# Читатели отдают пары (номер строки, запись). Строка, которую не
+# удалось разобрать, тоже отдаётся — с ошибкой вместо записи: она
+# считается пропущенной и учитывается в отметке для продолжения.
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as error:
+            yield line_number, error
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as error:
+            yield reader.line_num, error
+            continue
+        yield reader.line_num, record
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает новости из JSONL или CSV (файл или stdin) '
+        'пачками через bulk_create. Поля: title, text, date (ГГГГ-ММ-ДД). '
+        'Новости с уже существующей парой (date, title) пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к файлу или «-» для чтения из stdin.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат входных данных; по умолчанию по расширению файла.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с числом обработанных записей для продолжения '
+                 'прерванной загрузки.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format'] or self._guess_format(path)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        checkpoint = options['checkpoint']
+        self.verbosity = options['verbosity']
+        done = self._read_checkpoint(checkpoint)
+        stream = self._open(path)
+        try:
+            records = READERS[data_format](stream)
+            # Уже загруженные записи пропускаем, не разбирая их в модели.
+            records = islice(records, done, None)
+            self._import(records, batch_size, checkpoint, done)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def _import(self, records, batch_size, checkpoint, done):
+        started = time.monotonic()
+        created = skipped = 0
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            news_list = [
+                self._build(line_number, record)
+                for line_number, record in batch
+            ]
+            with transaction.atomic():
+                new_news = self._without_duplicates(
+                    [news for news in news_list if news is not None]
+                )
+                News.objects.bulk_create(new_news)
+            done += len(batch)
+            created += len(new_news)
+            skipped += len(batch) - len(new_news)
+            self._write_checkpoint(checkpoint, done)
+            if self.verbosity >= 2:
+                self.stdout.write(
+                    f'Обработано {done}, '
+                    f'{done / (time.monotonic() - started):.0f} записей/с'
+                )
+        elapsed = time.monotonic() - started
+        rate = (created + skipped) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено новостей: {created}, пропущено: {skipped}, '
+            f'{rate:.0f} записей/с'
+        ))
+
+    def _build(self, line_number, record):
+        if isinstance(record, Exception):
+            self.stderr.write(f'Пропущена строка {line_number}: {record}')
+            return None
+        if not isinstance(record, dict):
+            self.stderr.write(
+                f'Пропущена строка {line_number}: ожидается объект'
+            )
+            return None
+        try:
+            news = News(
+                title=record['title'],
+                text=record.get('text') or '',
+                date=date.fromisoformat(record['date'])
+                if record.get('date') else date.today(),
+            )
+        except (KeyError, TypeError, ValueError) as error:
+            self.stderr.write(
+                f'Пропущена строка {line_number}: {error!r} в {record!r}'
+            )
+            return None
+        if not news.title or len(news.title) > News.title.field.max_length:
+            self.stderr.write(
+                f'Пропущена строка {line_number}: неверный title'
+            )
+            return None
+        return news
+
+    @staticmethod
+    def _without_duplicates(news_list):
+        """Отбрасывает новости, чья пара (date, title) уже есть в базе."""
+        existing = set(News.objects.filter(
+            date__in={news.date for news in news_list},
+            title__in={news.title for news in news_list},
+        ).values_list('date', 'title'))
+        unique = []
+        for news in news_list:
+            key = (news.date, news.title)
+            if key not in existing:
+                existing.add(key)
+                unique.append(news)
+        return unique
+
+    @staticmethod
+    def _guess_format(path):
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension == 'json':
+            extension = 'jsonl'
+        if extension not in FORMATS:
+            raise CommandError(
+                'Не удалось определить формат, укажите --format.'
+            )
+        return extension
+
+    @staticmethod
+    def _open(path):
+        if path == '-':
+            return sys.stdin
+        try:
+            return open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+
+    @staticmethod
+    def _read_checkpoint(checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint, encoding='utf-8') as file:
+            return int(file.read().strip() or 0)
+
+    @staticmethod
+    def _write_checkpoint(checkpoint, done):
+        if not checkpoint:
+            return
+        # Запись через временный файл: прерывание не оставит битую отметку.
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(str(done))
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,72 @@
+from django.db import migrations
+
+# Полнотекстовый индекс SQLite FTS5 по новостям и комментариям.
+# Индексируемый текст хранится с заменой ё на е: токенизатор unicode61
+# их не отождествляет. Индекс поддерживают триггеры, поэтому он не
+# расходится с таблицами и при bulk_create или update().
+
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2'"
+
+
+def fold(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def index_sql(table, columns):
+    fts = f'{table}_fts'
+    names = ', '.join(columns)
+    new_values = ', '.join(fold(f'new.{column}') for column in columns)
+    old_values = ', '.join(fold(column) for column in columns)
+    assignments = ', '.join(
+        f'{column} = {fold(f"new.{column}")}' for column in columns
+    )
+    return [
+        f'CREATE VIRTUAL TABLE {fts} USING fts5({names}, {TOKENIZE})',
+        f'INSERT INTO {fts}(rowid, {names}) '
+        f'SELECT id, {old_values} FROM {table}',
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values}); '
+        f'END',
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN '
+        f'DELETE FROM {fts} WHERE rowid = old.id; '
+        f'END',
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN '
+        f'UPDATE {fts} SET {assignments} WHERE rowid = new.id; '
+        f'END',
+    ]
+
+
+def drop_sql(table):
+    fts = f'{table}_fts'
+    return [
+        f'DROP TRIGGER IF EXISTS {fts}_ai',
+        f'DROP TRIGGER IF EXISTS {fts}_ad',
+        f'DROP TRIGGER IF EXISTS {fts}_au',
+        f'DROP TABLE IF EXISTS {fts}',
+    ]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0004_comment_news_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run(
+                index_sql('news_news', ('title', 'text'))
+                + index_sql('news_comment', ('text',))
+            ),
+            run(drop_sql('news_news') + drop_sql('news_comment')),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from importlib import import_module
+
+from django.db import migrations, models
+import django.utils.timezone
+
+# SQLite добавляет столбец пересборкой таблицы news_news, а вместе со
+# старой таблицей пропадают триггеры поискового индекса новостей. Их
+# создаём заново после пересборки в обе стороны.
+search_index = import_module('news.migrations.0005_search_index')
+restore_triggers = search_index.run(
+    search_index.drop_sql('news_news')[:3] + [
+        statement
+        for statement in search_index.index_sql('news_news', ('title', 'text'))
+        if statement.startswith('CREATE TRIGGER')
+    ]
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='news',
+            name='updated',
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now,
+                verbose_name='Изменена'
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -2,15 +2,60 @@ from datetime import datetime
 
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+class NewsQuerySet(models.QuerySet):
+
+    def touch(self):
+        """Отмечает изменение новости или её комментариев."""
+        return self.update(updated=timezone.now())
+
+    def shift_comment_count(self, delta):
+        """Атомарно изменяет счётчик комментариев на delta."""
+        queryset = self
+        if delta < 0:
+            # Счётчик не может уйти в минус, даже если он разошёлся
+            # с таблицей комментариев.
+            queryset = self.filter(comment_count__gte=-delta)
+        return queryset.update(
+            comment_count=models.F('comment_count') + delta,
+            updated=timezone.now(),
+        )
+
+    def recount_comments(self):
+        """Пересчитывает счётчик комментариев по таблице Comment."""
+        counts = Comment.objects.filter(
+            news=models.OuterRef('pk')
+        ).order_by().values('news').annotate(
+            count=models.Count('pk')
+        ).values('count')
+        return self.update(
+            comment_count=Coalesce(models.Subquery(counts), 0)
+        )
 
 
 class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    # Время последнего изменения новости или её комментариев: по нему
+    # страница новости отвечает на условные запросы.
+    updated = models.DateTimeField('Изменена', auto_now=True)
+
+    objects = NewsQuerySet.as_manager()
 
     class Meta:
-        ordering = ('-date',)
+        ordering = ('-date', '-id')
+        indexes = (
+            models.Index(fields=('-date', '-id'), name='news_date_id_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
@@ -31,7 +76,12 @@ class Comment(models.Model):
     created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ('created',)
+        ordering = ('created', 'id')
+        indexes = (
+            models.Index(
+                fields=('news', 'created'), name='comment_news_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
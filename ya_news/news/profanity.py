@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from collections import deque
+
+# Латинские буквы, которые пишут вместо похожих кириллических.
+LOOKALIKES = str.maketrans({
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к', 'm': 'м',
+    'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у', 'ё': 'е',
+})
+
+
+def normalize(text):
+    """Приводит текст к виду, в котором ищутся слова из словаря."""
+    return text.lower().translate(LOOKALIKES)
+
+
+class Matcher:
+    """
+    Автомат Ахо — Корасик для поиска слов словаря в тексте.
+
+    Строится один раз на весь словарь; поиск проходит текст за один
+    проход независимо от числа слов.
+    """
+
+    def __init__(self, words):
+        self._goto = [{}]
+        self._fail = [0]
+        self._match = [None]
+        for word in words:
+            self._add(normalize(word))
+        self._build()
+
+    def _add(self, word):
+        if not word:
+            return
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._match.append(None)
+            state = next_state
+        self._match[state] = word
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                # Совпадение по суффиксу тоже считается совпадением.
+                if self._match[next_state] is None:
+                    self._match[next_state] = self._match[fail]
+
+    def search(self, text):
+        """Первое найденное слово словаря или None."""
+        goto, fail, match = self._goto, self._fail, self._match
+        state = 0
+        for char in normalize(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if match[state] is not None:
+                return match[state]
+        return None
+
+
+class WordList:
+    """
+    Словарь запрещённых слов из файла с перезагрузкой на лету.
+
+    Файл проверяется не чаще раза в check_interval секунд; при изменении
+    автомат пересобирается и подменяется целиком. Если файла нет,
+    используются слова по умолчанию.
+    """
+
+    def __init__(self, path, default=(), check_interval=5):
+        self.path = path
+        self.default = tuple(default)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._matcher = None
+        self._mtime = None
+        self._checked = 0
+
+    def _read(self):
+        with open(self.path, encoding='utf-8') as file:
+            return [
+                line.strip() for line in file
+                if line.strip() and not line.startswith('#')
+            ]
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns if self.path else None
+        except FileNotFoundError:
+            mtime = None
+        if self._matcher is not None and mtime == self._mtime:
+            return
+        words = self._read() if mtime is not None else self.default
+        self._matcher = Matcher(words)
+        self._mtime = mtime
+
+    def matcher(self):
+        now = time.monotonic()
+        if self._matcher is None or now - self._checked >= self.check_interval:
+            with self._lock:
+                self._reload()
+                self._checked = now
+        return self._matcher
+
+    def search(self, text):
+        return self.matcher().search(text)
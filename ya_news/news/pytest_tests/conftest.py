@@ -1,6 +1,14 @@
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
 import pytest
 
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.conf import settings
 
@@ -8,6 +16,17 @@ from news.models import News, Comment
 
 from datetime import datetime, timedelta
 
+QUERY_BUDGETS_PATH = Path(__file__).resolve().parent / 'query_budgets.json'
+# QUERY_BUDGETS_UPDATE=1 перезаписывает бюджеты измеренными значениями.
+QUERY_BUDGETS_UPDATE = bool(os.environ.get('QUERY_BUDGETS_UPDATE'))
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # id новостей в тестовой базе повторяются, поэтому кеш карточек
+    # не должен переживать тест.
+    cache.clear()
+
 
 @pytest.fixture
 def news():
@@ -77,6 +96,7 @@ def news_multiple_comments(news, author):
         )
         comment.created = now - timedelta(days=index)
         comment.save()
+    news.refresh_from_db()
     return news
 
 
@@ -85,6 +105,69 @@ def news_pk_for_args(news):
     return (news.id,)
 
 
+@pytest.fixture
+def comment_pk_for_args(comment):
+    return (comment.id,)
+
+
 @pytest.fixture
 def comment_form_data():
     return {'text': 'Новый текст комментария'}
+
+
+@pytest.fixture(scope='session')
+def query_budgets():
+    return json.loads(QUERY_BUDGETS_PATH.read_text(encoding='utf-8'))
+
+
+@pytest.fixture
+def query_budget(query_budgets):
+    """
+    Проверяет, что запрос к странице укладывается в бюджет SQL-запросов.
+
+    Бюджеты хранятся в query_budgets.json под ключом «метод имя_url».
+    """
+    @contextmanager
+    def check(name, method='GET'):
+        key = f'{method} {name}'
+        with CaptureQueriesContext(connection) as context:
+            yield
+        count = len(context.captured_queries)
+        if QUERY_BUDGETS_UPDATE:
+            query_budgets[key] = count
+            QUERY_BUDGETS_PATH.write_text(
+                json.dumps(query_budgets, indent=4, sort_keys=True) + '\n',
+                encoding='utf-8'
+            )
+            return
+        assert key in query_budgets, f'Нет бюджета запросов для {key}'
+        queries = '\n'.join(
+            query['sql'] for query in context.captured_queries
+        )
+        assert count <= query_budgets[key], (
+            f'{key}: {count} запросов при бюджете {query_budgets[key]}:\n'
+            f'{queries}'
+        )
+
+    return check
+
+
+@pytest.fixture
+def cached_auth(settings):
+    """Сессия в подписанной cookie и пользователь из кеша."""
+    settings.SESSION_ENGINE = (
+        'django.contrib.sessions.backends.signed_cookies'
+    )
+    settings.MIDDLEWARE = [
+        'yacommon.middleware.CachedAuthenticationMiddleware'
+        if name == 'django.contrib.auth.middleware.AuthenticationMiddleware'
+        else name
+        for name in settings.MIDDLEWARE
+    ]
+
+
+@pytest.fixture
+def profile_dir(settings, tmp_path):
+    """Каталог профилей запросов во временной папке."""
+    settings.REQUEST_PROFILE_DIR = tmp_path / 'profiles'
+    return settings.REQUEST_PROFILE_DIR
@@ -1,9 +1,21 @@
+import os
+import subprocess
+import sys
+from http import HTTPStatus
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
 from django.urls import reverse
 from django.conf import settings
 
 import pytest
 
+from news import cards
+from news.models import News
+from news.search import stem
 from news.forms import CommentForm
+from news.views import NewsDetailView
+from yacommon import executor
 
 
 @pytest.mark.django_db
@@ -20,18 +32,95 @@ def test_home_page_news_count_and_order(client):
     assert all_dates == sorted_dates
 
 
+@pytest.mark.django_db
+@pytest.mark.usefixtures('multiple_news')
+def test_home_page_keyset_pagination(client, django_assert_num_queries):
+    url = reverse('news:home')
+    first_page = client.get(url).context['page']
+    assert first_page.before is None
+    assert first_page.after is not None
+    with django_assert_num_queries(1):
+        response = client.get(url, {'after': first_page.after})
+    older_page = response.context['page']
+    assert len(older_page.object_list) == 1
+    assert older_page.after is None
+    response = client.get(url, {'before': older_page.before})
+    assert response.context['object_list'] == first_page.object_list
+
+
+@pytest.mark.django_db
+def test_home_page_invalid_cursor(client):
+    url = reverse('news:home')
+    response = client.get(url, {'after': 'not-a-cursor'})
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_home_page_shows_comment_count(client, news_multiple_comments):
+    url = reverse('news:home')
+    response = client.get(url)
+    assert f'Комментариев: {news_multiple_comments.comment_count}' in (
+        response.content.decode()
+    )
+
+
+@pytest.mark.django_db
+def test_home_page_cards_are_cached(client, news):
+    url = reverse('news:home')
+    client.get(url)
+    assert cards.stats() == {'hits': 0, 'misses': 1}
+    client.get(url)
+    assert cards.stats() == {'hits': 1, 'misses': 1}
+
+
+def test_home_page_card_invalidated_by_comment(author_client, client, news,
+                                               comment_form_data):
+    url = reverse('news:home')
+    response = client.get(url)
+    assert 'Комментариев' not in response.content.decode()
+    author_client.post(
+        reverse('news:detail', args=(news.id,)), data=comment_form_data
+    )
+    response = client.get(url)
+    assert 'Комментариев: 1' in response.content.decode()
+
+
 @pytest.mark.django_db
 def test_detail_page_comment_order(client, news_multiple_comments):
     url = reverse('news:detail', args=(news_multiple_comments.id,))
     response = client.get(url)
     assert 'news' in response.context
-    news_obj = response.context['news']
-    comment_set = news_obj.comment_set.all()
+    comment_set = response.context['comments']
+    assert len(comment_set) == news_multiple_comments.comment_count
     all_dates = [comment.created for comment in comment_set]
     sorted_dates = sorted(all_dates)
     assert all_dates == sorted_dates
 
 
+@pytest.mark.django_db
+def test_detail_page_comments_pagination(client, settings,
+                                         news_multiple_comments):
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 3
+    url = reverse('news:detail', args=(news_multiple_comments.id,))
+    response = client.get(url)
+    first_page = response.context['page']
+    assert len(response.context['comments']) == 3
+    assert first_page.before is None
+    response = client.get(url, {'after': first_page.after})
+    second_page = response.context['comments']
+    assert len(second_page) == 3
+    assert second_page[0].created > first_page.object_list[-1].created
+
+
+@pytest.mark.django_db
+def test_detail_page_comment_author_projection(client, comment):
+    url = reverse('news:detail', args=(comment.news_id,))
+    response = client.get(url)
+    author = response.context['comments'][0].author
+    assert author.get_deferred_fields() >= {'password', 'email'}
+    assert author.username == comment.author.username
+
+
 @pytest.mark.django_db
 def test_detail_page_no_comment_form_for_anonymous_user(
     client, news_pk_for_args
@@ -49,3 +138,69 @@ def test_detail_page_authorized_user_has_form(
     response = author_client.get(url)
     assert 'form' in response.context
     assert isinstance(response.context['form'], CommentForm)
+
+
+@pytest.mark.parametrize(
+    'word, expected',
+    [
+        ('новостями', 'новост'),
+        ('новости', 'новост'),
+        ('ёлками', 'елк'),
+        ('популярности', 'популярн'),
+    ]
+)
+def test_russian_stem(word, expected):
+    assert stem(word) == expected
+
+
+@pytest.mark.django_db
+def test_search_finds_news_and_comments(client, comment):
+    other = News.objects.create(title='Погода', text='Идут дожди.')
+    url = reverse('news:search')
+    response = client.get(url, {'q': 'тексты'})
+    results = response.context['results']
+    assert [news for news, _ in results] == [comment.news]
+    response = client.get(url, {'q': 'комментарии'})
+    news, snippet = response.context['results'][0]
+    assert news == comment.news
+    assert '<mark>комментария</mark>' in snippet
+    response = client.get(url, {'q': 'дождь'})
+    assert [news for news, _ in response.context['results']] == [other]
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('multiple_news')
+def test_search_is_paged(client):
+    url = reverse('news:search')
+    response = client.get(url, {'q': 'текст'})
+    assert len(response.context['results']) == settings.NEWS_COUNT_ON_HOME_PAGE
+    assert response.context['has_next']
+    response = client.get(url, {'q': 'текст', 'page': 2})
+    assert len(response.context['results']) == 1
+    assert not response.context['has_next']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_views_render_in_pool(news, rf):
+    # Пул открывает свои соединения, поэтому нужна транзакционная база.
+    request = rf.get(reverse('news:detail', args=(news.pk,)))
+    request.user = AnonymousUser()
+    view = executor.as_async(NewsDetailView.as_view())
+    response = async_to_sync(view)(request, pk=news.pk)
+    assert response.status_code == HTTPStatus.OK
+    assert news.title in response.content.decode()
+
+
+def test_search_is_not_imported_on_startup():
+    code = (
+        'import sys, django; django.setup(); '
+        'from django.urls import get_resolver; '
+        'get_resolver().url_patterns; '
+        'print("news.search" in sys.modules)'
+    )
+    completed = subprocess.run(
+        [sys.executable, '-c', code], cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yanews.settings'},
+        capture_output=True, text=True, check=True,
+    )
+    assert completed.stdout.strip() == 'False'
@@ -1,7 +1,26 @@
+import io
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
 
-from news.models import Comment
+from news.models import Comment, News
 from news.forms import BAD_WORDS, WARNING
+from news.ingestion import CommentIngestion
+from news.profanity import WordList
+from yacommon import routers
+from yacommon.middleware import PIN_COOKIE
 
 import pytest
 
@@ -9,6 +28,37 @@ from pytest_django.asserts import assertRedirects, assertFormError
 
 from http import HTTPStatus
 
+# Сервер с предварительным fork на отдельной базе. Писатель ждёт пачку
+# минуту, поэтому до остановки комментарий лежит только в очереди.
+PREFORK_SERVER = '''
+import sys
+
+import django
+from django.conf import settings
+
+database, port, ready_file, session_file = sys.argv[1:]
+settings.DATABASES['default']['NAME'] = database
+settings.MIDDLEWARE.remove('django.middleware.csrf.CsrfViewMiddleware')
+settings.COMMENT_INGESTION_ENABLED = True
+settings.COMMENT_INGESTION_FLUSH_INTERVAL = 60
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client
+from news.models import News
+
+call_command('migrate', verbosity=0)
+News.objects.create(title='Заголовок', text='Текст')
+client = Client()
+client.force_login(get_user_model().objects.create(username='Автор'))
+with open(session_file, 'w') as file:
+    file.write(client.cookies[settings.SESSION_COOKIE_NAME].value)
+call_command(
+    'serve_prefork', f'127.0.0.1:{port}', workers=1, ready_file=ready_file
+)
+'''
+
 
 @pytest.mark.django_db
 def test_anonymous_user_cant_create_comment(client, news_pk_for_args,
@@ -30,6 +80,103 @@ def test_user_can_create_comment(author_client, news,
     assert comment.author == author
 
 
+def test_comment_count_grows_on_create(author_client, news,
+                                       comment_form_data):
+    url = reverse('news:detail', args=(news.id,))
+    author_client.post(url, data=comment_form_data)
+    news.refresh_from_db()
+    assert news.comment_count == 1
+
+
+def test_comment_count_drops_on_delete(author_client, comment, news):
+    url = reverse('news:delete', args=(comment.id,))
+    author_client.post(url)
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+@pytest.mark.django_db
+def test_comment_count_follows_saves_outside_views(news, author, reader):
+    # Так пишут комментарии админка и каскадное удаление пользователя.
+    Comment.objects.create(news=news, author=reader, text='Из админки')
+    Comment.objects.create(news=news, author=author, text='Текст')
+    news.refresh_from_db()
+    assert news.comment_count == 2
+    author.delete()
+    news.refresh_from_db()
+    assert news.comment_count == 1
+
+
+@pytest.mark.django_db
+def test_import_news_command_skips_duplicates(tmp_path, news):
+    path = tmp_path / 'news.jsonl'
+    records = [
+        {'title': news.title, 'text': 'Дубль', 'date': str(news.date)},
+        {'title': 'Новая', 'text': 'Текст', 'date': '2022-11-01'},
+        {'title': 'Новая', 'text': 'Дубль', 'date': '2022-11-01'},
+        {'title': 'Без даты', 'text': 'Текст'},
+    ]
+    path.write_text(
+        '\n'.join(json.dumps(record) for record in records),
+        encoding='utf-8'
+    )
+    call_command('import_news', str(path), batch_size=2)
+    assert News.objects.count() == 3
+    assert News.objects.filter(title='Новая').get().text == 'Текст'
+
+
+@pytest.mark.django_db
+def test_import_news_command_resumes_from_checkpoint(tmp_path):
+    path = tmp_path / 'news.csv'
+    path.write_text(
+        'title,text,date\n'
+        'Первая,Текст,2022-10-01\n'
+        'Вторая,Текст,2022-10-02\n'
+        'Третья,Текст,2022-10-03\n',
+        encoding='utf-8'
+    )
+    checkpoint = tmp_path / 'checkpoint'
+    checkpoint.write_text('2', encoding='utf-8')
+    call_command('import_news', str(path), checkpoint=str(checkpoint))
+    assert list(News.objects.values_list('title', flat=True)) == ['Третья']
+    assert checkpoint.read_text(encoding='utf-8') == '3'
+
+
+@pytest.mark.django_db
+def test_import_news_command_skips_malformed_lines(tmp_path):
+    path = tmp_path / 'news.jsonl'
+    path.write_text(
+        '{"title": "Первая", "date": "2022-10-01"}\n'
+        '{"title": "Битая", "date": \n'
+        '[1, 2]\n'
+        '{"text": "Без заголовка"}\n'
+        '{"title": "Вторая", "date": "2022-10-02"}\n',
+        encoding='utf-8'
+    )
+    checkpoint = tmp_path / 'checkpoint'
+    stdout, stderr = io.StringIO(), io.StringIO()
+    call_command(
+        'import_news', str(path), batch_size=2, checkpoint=str(checkpoint),
+        stdout=stdout, stderr=stderr
+    )
+    assert sorted(News.objects.values_list('title', flat=True)) == [
+        'Вторая', 'Первая'
+    ]
+    assert 'пропущено: 3' in stdout.getvalue()
+    assert [
+        line.split(':')[0] for line in stderr.getvalue().splitlines()
+    ] == ['Пропущена строка 2', 'Пропущена строка 3', 'Пропущена строка 4']
+    assert checkpoint.read_text(encoding='utf-8') == '5'
+
+
+@pytest.mark.django_db
+def test_recount_comments_command(news_multiple_comments):
+    News.objects.update(comment_count=0)
+    call_command('recount_comments')
+    news_multiple_comments.refresh_from_db()
+    assert news_multiple_comments.comment_count == Comment.objects.count()
+
+
 def test_user_cant_use_bad_words(author_client, news):
     url = reverse('news:detail', args=(news.id,))
     bad_words_data = {'text': f'Какой-то текст, {BAD_WORDS[0]}, еще текст'}
@@ -38,6 +185,103 @@ def test_user_cant_use_bad_words(author_client, news):
     assert Comment.objects.count() == 0
 
 
+@pytest.mark.django_db(transaction=True)
+def test_ingestion_writes_comments_in_batches(news, author):
+    ingestion = CommentIngestion(batch_size=2, flush_interval=1)
+    # Пока писатель не запущен, комментарий сохраняется синхронно.
+    assert not ingestion.submit(Comment(news=news, author=author, text='0'))
+    ingestion.start()
+    for index in range(3):
+        assert ingestion.submit(
+            Comment(news=news, author=author, text=f'Текст {index}')
+        )
+    ingestion.stop()
+    assert Comment.objects.count() == 3
+    news.refresh_from_db()
+    assert news.comment_count == 3
+    stats = ingestion.stats()
+    assert stats['written'] == 3
+    assert stats['max_batch'] == 2
+    assert stats['depth'] == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ingestion_drops_only_bad_comments(news, author):
+    ingestion = CommentIngestion(batch_size=10)
+    for text in ('Первый', None, 'Третий'):
+        ingestion._queue.put(Comment(news=news, author=author, text=text))
+    ingestion.flush()
+    assert sorted(Comment.objects.values_list('text', flat=True)) == [
+        'Первый', 'Третий'
+    ]
+    news.refresh_from_db()
+    assert news.comment_count == 2
+    stats = ingestion.stats()
+    assert (stats['written'], stats['failed']) == (2, 1)
+
+
+def _comments(database):
+    with sqlite3.connect(database) as db:
+        return db.execute('SELECT text FROM news_comment').fetchall()
+
+
+def test_prefork_worker_writes_queued_comments_on_stop(tmp_path):
+    database = tmp_path / 'db.sqlite3'
+    ready_file = tmp_path / 'ready'
+    session_file = tmp_path / 'session'
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [
+            sys.executable, '-c', PREFORK_SERVER,
+            database, str(port), ready_file, session_file,
+        ],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yanews.settings'},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while not ready_file.exists():
+            assert server.poll() is None and time.monotonic() < deadline
+            time.sleep(0.1)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session_file.read_text()}'
+        urlopen(Request(
+            f'http://127.0.0.1:{port}{reverse("news:detail", args=(1,))}',
+            data=urlencode({'text': 'Комментарий'}).encode(),
+            headers={'Cookie': cookie},
+        ), timeout=10)
+        assert _comments(database) == []
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+    assert _comments(database) == [('Комментарий',)]
+
+
+@pytest.mark.parametrize(
+    'text',
+    ('Ну ты НЕГОДЯЙ!', 'Какая-то рeдискa'),
+)
+def test_user_cant_use_disguised_bad_words(author_client, news, text):
+    url = reverse('news:detail', args=(news.id,))
+    response = author_client.post(url, data={'text': text})
+    assertFormError(response, 'form', 'text', errors=WARNING)
+    assert Comment.objects.count() == 0
+
+
+def test_bad_words_file_is_reloaded(tmp_path):
+    path = tmp_path / 'bad_words.txt'
+    path.write_text('# словарь\nёлка\n', encoding='utf-8')
+    words = WordList(path, default=BAD_WORDS, check_interval=0)
+    assert words.search('Новая елка!') == 'елка'
+    assert words.search(BAD_WORDS[0]) is None
+    path.write_text('палка\n', encoding='utf-8')
+    os.utime(path, ns=(0, 0))
+    assert words.search('Новая елка!') is None
+    assert words.search('Палка') == 'палка'
+
+
 def test_author_can_delete_comment(author_client, comment, news_pk_for_args):
     url = reverse('news:delete', args=(comment.id,))
     news_url = reverse('news:detail', args=news_pk_for_args)
@@ -73,3 +317,37 @@ def test_user_cannot_edit_comment_of_another_user(reader_client, comment,
     assert response.status_code == HTTPStatus.NOT_FOUND
     comment_from_db = Comment.objects.get(id=comment.id)
     assert comment_from_db.text == comment.text
+
+
+@pytest.mark.django_db
+def test_sqlite_pragmas_applied():
+    with connection.cursor() as cursor:
+        # 1 — NORMAL.
+        assert cursor.execute('PRAGMA synchronous').fetchone() == (1,)
+        assert cursor.execute('PRAGMA busy_timeout').fetchone() == (5000,)
+
+
+# Без транзакции теста: внутри неё чтение и так идёт из default.
+@pytest.mark.django_db(transaction=True)
+def test_router_reads_replica_until_write(settings, django_user_model):
+    settings.DATABASE_REPLICA = 'replica'
+    router = routers.PrimaryReplicaRouter()
+    routers.begin_request()
+    try:
+        assert router.db_for_read(News) == 'replica'
+        assert router.db_for_read(django_user_model) is None
+        assert router.db_for_write(News) == 'default'
+        assert router.db_for_read(News) == 'default'
+    finally:
+        routers.end_request()
+
+
+@pytest.mark.django_db
+def test_write_pins_user_to_primary(settings, author_client,
+                                    news_pk_for_args, comment_form_data):
+    settings.DATABASE_REPLICA = 'replica'
+    url = reverse('news:detail', args=news_pk_for_args)
+    response = author_client.post(url, data=comment_form_data)
+    assert PIN_COOKIE in response.cookies
+    response = author_client.get(url)
+    assert response.wsgi_request.db_state.pinned
@@ -1,11 +1,28 @@
+import asyncio
+import json
+import os
+import time
 from http import HTTPStatus
+from unittest import mock
 
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 import pytest
 
 from pytest_django.asserts import assertRedirects
 
+from yacommon.pagination import KeysetPaginator
+from news.views import NewsDetailView
+from yacommon import executor, profiling
+from yacommon.middleware import RequestProfileMiddleware
+
 
 @pytest.mark.django_db
 @pytest.mark.parametrize(
@@ -54,3 +71,208 @@ def test_redirect_for_anonynous_user(client, comment, name):
     redirect_url = f'{login_url}?next={url}'
     response = client.get(url)
     assertRedirects(response, redirect_url)
+
+
+@pytest.mark.django_db
+def test_detail_page_not_modified(client, news_pk_for_args):
+    url = reverse('news:detail', args=news_pk_for_args)
+    response = client.get(url)
+    assert response.has_header('ETag')
+    assert response.has_header('Last-Modified')
+    response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_detail_page_modified_after_comment(author_client, news_pk_for_args,
+                                            comment_form_data):
+    url = reverse('news:detail', args=news_pk_for_args)
+    etag = author_client.get(url)['ETag']
+    author_client.post(url, data=comment_form_data)
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+def test_detail_page_validators_do_not_depend_on_process_cache(
+    client, author_client, comment, news_pk_for_args
+):
+    url = reverse('news:detail', args=news_pk_for_args)
+    etag = client.get(url)['ETag']
+    # Другой процесс сервера не видит кеш этого процесса.
+    cache.clear()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == (
+        HTTPStatus.NOT_MODIFIED
+    )
+    comment.text = 'Исправленный текст'
+    comment.save()
+    cache.clear()
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == (
+        HTTPStatus.OK
+    )
+
+
+@pytest.mark.django_db
+def test_detail_page_has_no_last_modified_for_user(author_client,
+                                                   news_pk_for_args):
+    url = reverse('news:detail', args=news_pk_for_args)
+    response = author_client.get(url)
+    assert response.has_header('ETag')
+    assert not response.has_header('Last-Modified')
+
+
+@pytest.mark.django_db
+def test_detail_page_etag_varies_on_user(client, author_client,
+                                         news_pk_for_args):
+    url = reverse('news:detail', args=news_pk_for_args)
+    etag = client.get(url)['ETag']
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('multiple_news', 'comment')
+@pytest.mark.parametrize(
+    'name, args',
+    [
+        ('news:home', None),
+        ('news:detail', pytest.lazy_fixture('news_pk_for_args')),
+        ('news:edit', pytest.lazy_fixture('comment_pk_for_args')),
+        ('news:delete', pytest.lazy_fixture('comment_pk_for_args')),
+    ]
+)
+def test_get_query_budget(author_client, query_budget, name, args):
+    url = reverse(name, args=args)
+    with query_budget(name):
+        response = author_client.get(url)
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'name, args',
+    [
+        ('news:detail', pytest.lazy_fixture('news_pk_for_args')),
+        ('news:edit', pytest.lazy_fixture('comment_pk_for_args')),
+        ('news:delete', pytest.lazy_fixture('comment_pk_for_args')),
+    ]
+)
+def test_post_query_budget(author_client, query_budget, comment_form_data,
+                           name, args):
+    url = reverse(name, args=args)
+    with query_budget(name, 'POST'):
+        response = author_client.post(url, data=comment_form_data)
+    assert response.status_code == HTTPStatus.FOUND
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    return len(queries)
+
+
+@pytest.mark.django_db
+def test_cached_auth_saves_session_and_user_queries(
+    request, author, author_client, comment_pk_for_args
+):
+    url = reverse('news:edit', args=comment_pk_for_args)
+    default_count = count_queries(author_client, url)
+    request.getfixturevalue('cached_auth')
+    client = Client()
+    client.force_login(author)
+    # Первый запрос кладёт пользователя в кеш.
+    count_queries(client, url)
+    assert count_queries(client, url) == default_count - 2
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('cached_auth')
+def test_password_change_invalidates_cached_user(author,
+                                                 comment_pk_for_args):
+    client = Client()
+    client.force_login(author)
+    url = reverse('news:edit', args=comment_pk_for_args)
+    client.get(url)
+    author.set_password('new-password')
+    author.save()
+    response = client.get(url)
+    assertRedirects(response, f'{reverse("users:login")}?next={url}')
+
+
+@pytest.mark.django_db
+def test_profile_token_writes_profile(client, profile_dir, news_pk_for_args):
+    url = reverse('news:detail', args=news_pk_for_args)
+    response = client.get(url, HTTP_X_PROFILE=profiling.make_token())
+    profile_id = response[profiling.RESPONSE_HEADER]
+    assert (profile_dir / f'{profile_id}.folded').exists()
+    report = json.loads((profile_dir / f'{profile_id}.json').read_text())
+    assert report['status'] == HTTPStatus.OK
+    assert report['queries_count'] == sum(
+        query['count'] for query in report['top_queries']
+    ) > 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('headers', ({}, {'HTTP_X_PROFILE': 'forged'}))
+def test_request_without_token_is_not_profiled(client, profile_dir,
+                                               news_pk_for_args, headers):
+    url = reverse('news:detail', args=news_pk_for_args)
+    response = client.get(url, **headers)
+    assert profiling.RESPONSE_HEADER not in response
+    assert not profile_dir.exists()
+
+
+# Синхронная часть запроса идёт в отдельном потоке со своим соединением.
+@pytest.mark.django_db(transaction=True)
+def test_profile_middleware_keeps_asgi_chain_async(profile_dir,
+                                                   news_pk_for_args):
+    async def get_response(request):
+        return HttpResponse()
+
+    # Синхронный экземпляр Django обернул бы в sync_to_async.
+    assert asyncio.iscoroutinefunction(
+        RequestProfileMiddleware(get_response)
+    )
+    url = reverse('news:detail', args=news_pk_for_args)
+
+    async def get():
+        return await AsyncClient().get(
+            url, **{'X-Profile': profiling.make_token()}
+        )
+
+    def slow(*args, **kwargs):
+        # Представление заведомо успевает попасть в выборку стеков.
+        time.sleep(0.05)
+        return KeysetPaginator(*args, **kwargs)
+
+    with mock.patch('news.views.KeysetPaginator', slow):
+        response = async_to_sync(get)()
+    assert response.status_code == HTTPStatus.OK
+    profile_id = response[profiling.RESPONSE_HEADER]
+    report = json.loads((profile_dir / f'{profile_id}.json').read_text())
+    assert report['queries_count'] > 0
+    assert 'news.views:' in (profile_dir / f'{profile_id}.folded').read_text()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_profile_covers_executor_pool(profile_dir, news, rf):
+    request = rf.get(reverse('news:detail', args=(news.pk,)))
+    request.user = AnonymousUser()
+    view = executor.as_async(NewsDetailView.as_view())
+    response = profiling.profile(
+        request, lambda request: async_to_sync(view)(request, pk=news.pk)
+    )
+    profile_id = response[profiling.RESPONSE_HEADER]
+    report = json.loads((profile_dir / f'{profile_id}.json').read_text())
+    # Запросы идут в потоке пула, а не в потоке профиля.
+    assert report['queries_count'] > 0
+
+
+def test_prune_removes_oldest_profiles(tmp_path):
+    for number in range(4):
+        path = tmp_path / f'{number}.json'
+        path.write_bytes(b'x' * 10)
+        os.utime(path, (number, number))
+    profiling.prune(tmp_path, 25)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        '2.json', '3.json'
+    ]
@@ -0,0 +1,144 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import News
+
+_RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+_PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$'
+)
+_REFLEXIVE = re.compile(r'(с[яь])$')
+_ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|'
+    r'ую|юю|ая|яя|ою|ею)$'
+)
+_PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+_VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|'
+    r'ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|'
+    r'((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+_NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|'
+    r'ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+_DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+_SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+_WORD = re.compile(r'\w+')
+
+# Маркеры подсветки, которых не бывает в тексте; заменяются на <mark>
+# после экранирования HTML.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_SEARCH_SQL = f'''
+    SELECT news_id, MIN(rank), snippet FROM (
+        SELECT rowid AS news_id,
+               bm25(news_news_fts, 5.0, 1.0) AS rank,
+               snippet(news_news_fts, -1, '{_MARK_START}', '{_MARK_END}',
+                       '…', 16) AS snippet
+        FROM news_news_fts WHERE news_news_fts MATCH %s
+        UNION ALL
+        SELECT comment.news_id,
+               bm25(news_comment_fts) AS rank,
+               snippet(news_comment_fts, 0, '{_MARK_START}', '{_MARK_END}',
+                       '…', 16) AS snippet
+        FROM news_comment_fts
+        JOIN news_comment AS comment ON comment.id = news_comment_fts.rowid
+        WHERE news_comment_fts MATCH %s
+    )
+    GROUP BY news_id
+    ORDER BY MIN(rank), news_id DESC
+    LIMIT %s OFFSET %s
+'''
+
+
+def stem(word):
+    """Упрощённый стеммер Snowball для русского языка."""
+    word = word.lower().replace('ё', 'е')
+    match = _RV.match(word)
+    if not match:
+        return word
+    prefix, rv = match.groups()
+    stripped = _PERFECTIVE_GERUND.sub('', rv, 1)
+    if stripped == rv:
+        rv = _REFLEXIVE.sub('', rv, 1)
+        stripped = _ADJECTIVE.sub('', rv, 1)
+        if stripped != rv:
+            rv = _PARTICIPLE.sub('', stripped, 1)
+        else:
+            stripped = _VERB.sub('', rv, 1)
+            rv = _NOUN.sub('', rv, 1) if stripped == rv else stripped
+    else:
+        rv = stripped
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    if _DERIVATIONAL.match(rv):
+        rv = re.sub(r'ость?$', '', rv)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = _SUPERLATIVE.sub('', rv, 1)
+        if rv.endswith('нн'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def build_query(text):
+    """
+    Запрос FTS5 из пользовательской строки.
+
+    Каждое слово сводится к основе и ищется как префикс, так что
+    «новостями» находит и «новости», и «новость». Слова объединяются
+    через AND. Пустая строка даёт None.
+    """
+    terms = []
+    for word in _WORD.findall(text.lower().replace('ё', 'е')):
+        base = stem(word)
+        if len(base) < 2:
+            base = word
+        terms.append(f'"{base}"*')
+    return ' '.join(terms) or None
+
+
+def _highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(_MARK_START, '<mark>')
+        .replace(_MARK_END, '</mark>')
+    )
+
+
+def search(text, page=1, per_page=10):
+    """
+    Новости, найденные по тексту новости или комментариев к ней.
+
+    Возвращает список пар (новость, фрагмент с подсветкой) для страницы
+    и признак того, что есть следующая страница.
+    """
+    query = build_query(text)
+    if query is None:
+        return [], False
+    offset = (page - 1) * per_page
+    if connection.vendor != 'sqlite':
+        found = News.objects.filter(
+            Q(title__icontains=text) | Q(text__icontains=text)
+        )[offset:offset + per_page + 1]
+        results = [(news, '') for news in found]
+        return results[:per_page], len(results) > per_page
+    with connection.cursor() as cursor:
+        cursor.execute(_SEARCH_SQL, [query, query, per_page + 1, offset])
+        rows = cursor.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    news_by_id = News.objects.in_bulk([row[0] for row in rows])
+    results = [
+        (news_by_id[news_id], _highlight(snippet))
+        for news_id, _, snippet in rows
+        if news_id in news_by_id
+    ]
+    return results, has_next
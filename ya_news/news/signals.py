@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cards
+from .models import Comment, News
+
+
+def _invalidate(news_id):
+    cards.invalidate(news_id)
+    # Счётчик комментариев обновляется в той же транзакции уже после
+    # сигнала; повторная смена версии после коммита не даёт закешировать
+    # карточку, отрисованную по незафиксированным данным.
+    transaction.on_commit(lambda: cards.invalidate(news_id))
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def invalidate_news_card(sender, instance, **kwargs):
+    _invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_news_card_on_comment(sender, instance, **kwargs):
+    _invalidate(instance.news_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    # Счётчик из фикстуры загружается вместе с новостью.
+    if raw:
+        return
+    news = News.objects.filter(pk=instance.news_id)
+    if created:
+        news.shift_comment_count(1)
+    else:
+        # Новый комментарий виден по времени создания последнего
+        # комментария, правку отмечаем в строке новости.
+        news.touch()
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    # Сигнал приходит и при каскадном удалении комментариев
+    # пользователя, и из админки.
+    News.objects.filter(pk=instance.news_id).shift_comment_count(-1)
@@ -1,12 +1,24 @@
+from django.conf import settings
 from django.urls import path
 
 from news import views
+from yacommon import executor
 
 app_name = 'news'
 
+news_list = views.NewsList.as_view()
+news_detail = views.NewsDetailView.as_view()
+if settings.ASYNC_VIEWS:
+    # Обеим страницам нужна база: список читает новости страницы,
+    # подробная — валидаторы ETag. Отдать их из кеша без запроса нельзя,
+    # поэтому запрос и отрисовка идут одним заходом в пул.
+    news_list = executor.as_async(news_list)
+    news_detail = executor.as_async(news_detail)
+
 urlpatterns = [
-    path('', views.NewsList.as_view(), name='home'),
-    path('news/<int:pk>/', views.NewsDetailView.as_view(), name='detail'),
+    path('', news_list, name='home'),
+    path('search/', views.NewsSearch.as_view(), name='search'),
+    path('news/<int:pk>/', news_detail, name='detail'),
     path(
         'delete_comment/<int:pk>/',
         views.CommentDelete.as_view(),
@@ -1,9 +1,20 @@
+import hashlib
+from datetime import datetime, time
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
+from django.db.models import Max
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
+from django.utils import timezone
 from django.views import generic
+from django.views.decorators.http import condition
+
+from yacommon.pagination import KeysetPaginator
 
+from . import cards, ingestion
 from .forms import CommentForm
 from .models import Comment, News
 
@@ -15,13 +26,53 @@ class NewsList(generic.ListView):
 
     def get_queryset(self):
         """
-        Выводим только несколько последних новостей.
+        Выводим страницу новостей, начиная с самых свежих.
 
-        Их количество определяется в настройках проекта.
+        Размер страницы определяется в настройках проекта; более старые
+        и более новые страницы открываются по курсору из параметров
+        after и before.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        paginator = KeysetPaginator(
+            self.model.objects.all(),
+            self.model._meta.ordering,
+            settings.NEWS_COUNT_ON_HOME_PAGE,
+        )
+        self.page = paginator.get_page(self.request.GET)
+        return self.page.object_list
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page'] = self.page
+        context['cards'] = cards.render_cards(self.page.object_list)
+        return context
+
+
+class NewsSearch(generic.TemplateView):
+    """Поиск по новостям и комментариям."""
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        try:
+            page = int(self.request.GET.get('page', 1))
+        except ValueError:
+            raise Http404('Некорректный номер страницы.')
+        if page < 1:
+            raise Http404('Некорректный номер страницы.')
+        # Стеммер компилирует десяток регулярных выражений, а поиск
+        # нужен не каждому процессу: модуль загружается при первом поиске.
+        from . import search
+        results, has_next = search.search(
+            query, page, settings.NEWS_COUNT_ON_HOME_PAGE
+        )
+        context.update(
+            query=query,
+            results=results,
+            page_number=page,
+            has_next=has_next,
+        )
+        return context
 
 
 class NewsDetail(generic.DetailView):
@@ -29,14 +80,31 @@ class NewsDetail(generic.DetailView):
     template_name = 'news/detail.html'
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
+        obj = get_object_or_404(self.model, pk=self.kwargs['pk'])
         return obj
 
+    def get_comments(self):
+        """
+        Комментарии к новости для шаблона.
+
+        Из данных автора выбираем только то, что выводится на странице.
+        """
+        return Comment.objects.filter(news=self.object).select_related(
+            'author'
+        ).only(
+            'text', 'created', 'news', 'author__username'
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        paginator = KeysetPaginator(
+            self.get_comments(),
+            Comment._meta.ordering,
+            settings.COMMENTS_COUNT_ON_DETAIL_PAGE,
+        )
+        page = paginator.get_page(self.request.GET)
+        context['comments'] = page.object_list
+        context['page'] = page
         if self.request.user.is_authenticated:
             context['form'] = CommentForm()
         return context
@@ -59,18 +127,72 @@ class NewsComment(
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
-        comment.save()
+        if ingestion.submit(comment):
+            # Комментарий запишет поток-писатель вместе с соседними.
+            return super().form_valid(form)
+        # Счётчик у новости сдвигает сигнал в той же транзакции.
+        with transaction.atomic():
+            comment.save()
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
+
+
+def _detail_validators(request, pk):
+    """
+    Валидаторы ETag и Last-Modified страницы новости без комментариев.
+
+    Считаются одним запросом по строке новости и индексу комментариев,
+    то есть по базе, а не по кешу процесса: все процессы сервера
+    отвечают одинаково. Страница зависит от пользователя (шапка, форма,
+    ссылки на правку своих комментариев), поэтому в ETag входит его id,
+    а Last-Modified, который от пользователя не зависит, отдаётся
+    только анонимным пользователям.
+    """
+    if not hasattr(request, '_news_validators'):
+        row = News.objects.filter(pk=pk).annotate(
+            last_comment=Max('comment__created')
+        ).values_list(
+            'date', 'updated', 'comment_count', 'last_comment'
+        ).first()
+        if row is None:
+            validators = (None, None)
+        else:
+            date, updated, comment_count, last_comment = row
+            etag = hashlib.md5(
+                f'{pk}:{updated}:{comment_count}:{last_comment}:'
+                f'{request.user.pk}'.encode()
+            ).hexdigest()
+            last_modified = None
+            if not request.user.is_authenticated:
+                last_modified = max(filter(None, (
+                    timezone.make_aware(datetime.combine(date, time.min)),
+                    updated,
+                    last_comment,
+                )))
+            validators = (etag, last_modified)
+        request._news_validators = validators
+    return request._news_validators
+
+
+def news_detail_etag(request, pk):
+    return _detail_validators(request, pk)[0]
+
+
+def news_detail_last_modified(request, pk):
+    return _detail_validators(request, pk)[1]
 
 
 class NewsDetailView(generic.View):
 
     def get(self, request, *args, **kwargs):
-        view = NewsDetail.as_view()
+        view = condition(
+            etag_func=news_detail_etag,
+            last_modified_func=news_detail_last_modified,
+        )(NewsDetail.as_view())
         return view(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
@@ -83,9 +205,8 @@ class CommentBase(LoginRequiredMixin):
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
@@ -1,9 +1,14 @@
+import os
+import sys
 from pathlib import Path
 
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Общий для ya_news и ya_note пакет yacommon лежит в корне репозитория.
+sys.path.append(str(BASE_DIR.parent))
+
 SECRET_KEY = 'django-insecure-7)dgs++2!#==aye4rd=5)c)bw0eokiyqx0hts6#t80!$c&$s+('
 
 DEBUG = True
@@ -18,10 +23,13 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'news.apps.NewsConfig',
+    'yacommon.apps.CommonConfig',
 ]
 
 MIDDLEWARE = [
+    'yacommon.middleware.RequestProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yacommon.middleware.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -30,6 +38,16 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Сессия в подписанной cookie и пользователь из кеша: авторизованный
+# запрос не читает django_session и auth_user. Включается переменной
+# окружения DJANGO_CACHED_AUTH=1.
+CACHED_AUTH = os.environ.get('DJANGO_CACHED_AUTH') == '1'
+if CACHED_AUTH:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+    MIDDLEWARE[MIDDLEWARE.index(
+        'django.contrib.auth.middleware.AuthenticationMiddleware'
+    )] = 'yacommon.middleware.CachedAuthenticationMiddleware'
+
 ROOT_URLCONF = 'yanews.urls'
 
 TEMPLATES = [
@@ -55,9 +73,59 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами, а не открывается на каждый.
+        'CONN_MAX_AGE': 60,
+    },
+    # Копия основной базы для чтения; обновляется manage.py sync_replica.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['yacommon.routers.PrimaryReplicaRouter']
+
+# Из какой базы читать модели приложения; None — всё из default.
+DATABASE_REPLICA = os.environ.get('DJANGO_DATABASE_REPLICA') or None
+
+# Приложения, модели которых читаются из DATABASE_REPLICA.
+DATABASE_REPLICA_APPS = ['news']
+
+# Сколько секунд после своей записи пользователь читает из default.
+DATABASE_PRIMARY_PIN_SECONDS = 5
+
+# PRAGMA, которые выполняются для каждого нового соединения SQLite.
+# WAL позволяет читать во время записи, NORMAL в режиме WAL не теряет
+# целостность при сбое процесса, busy_timeout — сколько мс ждать
+# блокировку вместо ошибки «database is locked».
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер кеша страниц в КиБ.
+    'cache_size': -32 * 1024,
+    'temp_store': 'memory',
+}
+
+# В бою здесь нужен общий для всех воркеров бэкенд (Redis, Memcached),
+# иначе каждый процесс держит свою копию кеша карточек новостей.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+AUTH_USER_CACHE = 'default'
+
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+
+NEWS_CARD_CACHE = 'default'
+
+NEWS_CARD_CACHE_TIMEOUT = 60 * 60
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -80,3 +148,45 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+COMMENTS_COUNT_ON_DETAIL_PAGE = 50
+
+# Пакетная запись комментариев одним потоком-писателем (news.ingestion).
+COMMENT_INGESTION_ENABLED = False
+
+COMMENT_INGESTION_BATCH_SIZE = 100
+
+COMMENT_INGESTION_FLUSH_INTERVAL = 0.05
+
+COMMENT_INGESTION_QUEUE_SIZE = 10000
+
+# Файл со словарём запрещённых слов: по слову в строке, # — комментарий.
+BAD_WORDS_FILE = BASE_DIR / 'bad_words.txt'
+
+BAD_WORDS_CHECK_INTERVAL = 5
+
+# Асинхронные варианты представлений; включаются в asgi.py.
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS') == '1'
+
+# Размер пула потоков для базы в асинхронных представлениях.
+DB_THREADS = 8
+
+# Профили отдельных запросов: по токену в заголовке X-Profile
+# (yacommon.profiling.make_token()) или по доле запросов. None в
+# REQUEST_PROFILE_DIR отключает профилирование.
+REQUEST_PROFILE_DIR = BASE_DIR / 'profiles'
+
+REQUEST_PROFILE_SAMPLE_RATE = float(
+    os.environ.get('DJANGO_REQUEST_PROFILE_RATE', 0)
+)
+
+REQUEST_PROFILE_TOKEN_MAX_AGE = 60 * 60
+
+# Интервал снятия стека, секунды; чаще смены потоков под GIL
+# (sys.getswitchinterval()) он всё равно не выйдет.
+REQUEST_PROFILE_INTERVAL = 0.005
+
+# Старые профили удаляются, когда каталог больше этого размера.
+REQUEST_PROFILE_MAX_BYTES = 50 * 1024 * 1024
+
+REQUEST_PROFILE_TOP_QUERIES = 20
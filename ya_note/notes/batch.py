@@ -0,0 +1,168 @@
+"""
+Пакетное создание, изменение и удаление заметок одним запросом.
+
+Формат запроса:
+    {"operations": [
+        {"op": "create", "data": {"title": ..., "text": ..., "slug": ...}},
+        {"op": "update", "slug": "...", "data": {...}},
+        {"op": "delete", "slug": "..."}
+    ]}
+Либо применяются все операции, либо ни одна.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from . import history, signals, slugs
+from .forms import WARNING, NoteForm
+from .models import Note
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+OPERATIONS = (CREATE, UPDATE, DELETE)
+
+
+class BatchError(Exception):
+    """Запрос целиком не подходит под формат пакета."""
+
+
+def _validate_format(operations, max_operations):
+    if not isinstance(operations, list):
+        raise BatchError('Ожидается список operations.')
+    if len(operations) > max_operations:
+        raise BatchError(
+            f'Не больше {max_operations} операций в одном запросе.'
+        )
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise BatchError('Каждая операция должна быть объектом.')
+
+
+def _check_slugs(items, deleted):
+    """
+    Проверяет уникальность slug сразу для всего пакета.
+
+    Занятыми считаются slug из базы, кроме slug изменяемой заметки и
+    удаляемых в этом же пакете, а также повторы внутри пакета.
+    """
+    wanted = [
+        (item, item['form'].cleaned_data['slug'])
+        for item in items
+        if item.get('form') is not None and item['form'].is_valid()
+        and item['form'].cleaned_data['slug']
+    ]
+    taken = slugs.find_taken(
+        Note.objects.exclude(pk__in=deleted), [slug for _, slug in wanted]
+    )
+    repeats = Counter(slug for _, slug in wanted)
+    for item, slug in wanted:
+        instance = item['form'].instance
+        if repeats[slug] > 1 or taken.get(slug, instance.pk) != instance.pk:
+            item['form'].add_error('slug', slug + WARNING)
+
+
+def _prepare(author, operations):
+    """Разбирает операции и проверяет их правилами NoteForm."""
+    targets = {
+        operation.get('slug') for operation in operations
+        if operation.get('op') in (UPDATE, DELETE)
+    }
+    notes = {
+        note.slug: note
+        for note in Note.objects.filter(author=author, slug__in=targets)
+    }
+    items = []
+    deleted = set()
+    touched = set()
+    for operation in operations:
+        op = operation.get('op')
+        item = {'op': op, 'errors': {}}
+        items.append(item)
+        if op not in OPERATIONS:
+            item['errors'] = {'op': [f'Допустимые значения: {OPERATIONS}.']}
+            continue
+        instance = None
+        if op in (UPDATE, DELETE):
+            instance = notes.get(operation.get('slug'))
+            if instance is None:
+                item['errors'] = {'slug': ['Заметка не найдена.']}
+                continue
+            if instance.pk in touched:
+                item['errors'] = {
+                    'slug': ['Заметка уже изменяется в этом пакете.']
+                }
+                continue
+            touched.add(instance.pk)
+        item['instance'] = instance
+        if op == DELETE:
+            deleted.add(instance.pk)
+            continue
+        data = operation.get('data')
+        if not isinstance(data, dict):
+            item['errors'] = {'data': ['Ожидается объект с полями заметки.']}
+            continue
+        item['form'] = NoteForm(data, instance=instance, check_slug=False)
+    _check_slugs(items, deleted)
+    for item in items:
+        form = item.get('form')
+        if form is not None and not form.is_valid():
+            item['errors'] = form.errors.get_json_data()
+    return items
+
+
+def _apply(author, items):
+    deleted = [item['instance'].pk for item in items if item['op'] == DELETE]
+    # Сначала удаление, чтобы освободить slug удаляемых заметок.
+    Note.objects.filter(author=author, pk__in=deleted).delete()
+    updated = []
+    created = []
+    auto_slug = []
+    for item in items:
+        if item['op'] == DELETE:
+            continue
+        note = item['form'].save(commit=False)
+        note.author = author
+        note.render_html()
+        if not note.slug:
+            auto_slug.append(note)
+        elif item['op'] == UPDATE:
+            updated.append(note)
+        else:
+            created.append(note)
+    Note.objects.bulk_update(
+        updated, ('title', 'text', 'text_html', 'slug')
+    )
+    Note.objects.bulk_create(created)
+    history.record_many(updated + created)
+    # Пустой slug подбирает модель, уже с учётом slug из этого пакета.
+    for note in auto_slug:
+        note.save()
+    # bulk_update и bulk_create не отправляют сигналы модели.
+    signals.invalidate(author.pk)
+
+
+def run(author, operations, max_operations):
+    """
+    Проверяет и применяет пакет операций в одной транзакции.
+
+    Возвращает признак применения и результаты по каждой операции.
+    """
+    _validate_format(operations, max_operations)
+    items = _prepare(author, operations)
+    applied = not any(item['errors'] for item in items)
+    if applied:
+        with transaction.atomic():
+            _apply(author, items)
+    results = []
+    for index, item in enumerate(items):
+        if item['errors']:
+            results.append(
+                {'index': index, 'status': 'error', 'errors': item['errors']}
+            )
+            continue
+        result = {'index': index, 'status': 'ok' if applied else 'skipped'}
+        if item['op'] != DELETE and applied:
+            result['slug'] = item['form'].instance.slug
+        results.append(result)
+    return applied, results
@@ -0,0 +1,84 @@
+"""
+Кеш заметок и отрисованных страниц заметок, отдельный для каждого автора.
+
+Каждый ключ включает id автора и версию его заметок. Любая запись в
+заметки автора меняет версию, поэтому сброс — одна операция, а старые
+записи вытесняются сами. Кеш включается настройкой NOTES_DETAIL_CACHE.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = 'notes-version:{author_id}'
+OBJECT_KEY = 'notes-object:{author_id}:{version}:{slug}'
+PAGE_KEY = 'notes-page:{author_id}:{version}:{slug}'
+
+
+def get_cache():
+    """Кеш заметок или None, если кеширование выключено."""
+    if settings.NOTES_DETAIL_CACHE is None:
+        return None
+    return caches[settings.NOTES_DETAIL_CACHE]
+
+
+def invalidate(author_id):
+    """Меняет версию заметок автора; старые ключи больше не читаются."""
+    cache = get_cache()
+    if cache is not None:
+        cache.set(
+            VERSION_KEY.format(author_id=author_id), time.time_ns(),
+            timeout=None
+        )
+
+
+def _get_version(cache, author_id):
+    key = VERSION_KEY.format(author_id=author_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        # add, а не set: параллельный запрос мог уже сменить версию.
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def _key(template, cache, author_id, slug):
+    return template.format(
+        author_id=author_id, version=_get_version(cache, author_id),
+        slug=slug
+    )
+
+
+def get_object(author_id, slug, load):
+    """Заметка автора по slug из кеша; при промахе — через load()."""
+    cache = get_cache()
+    if cache is None:
+        return load()
+    key = _key(OBJECT_KEY, cache, author_id, slug)
+    note = cache.get(key)
+    if note is None:
+        note = load()
+        cache.set(key, note, settings.NOTES_DETAIL_CACHE_TIMEOUT)
+    return note
+
+
+def page_key(author_id, slug):
+    """
+    Ключ страницы заметки при текущей версии или None без кеша.
+
+    Ключ берётся до чтения заметки: если она изменится, пока страница
+    рисуется, страница ляжет под уже устаревшей версией.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    return _key(PAGE_KEY, cache, author_id, slug)
+
+
+def get_page(key):
+    return get_cache().get(key)
+
+
+def set_page(key, content):
+    get_cache().set(key, content, settings.NOTES_DETAIL_CACHE_TIMEOUT)
@@ -1,5 +1,3 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
@@ -15,15 +13,29 @@ class NoteForm(forms.ModelForm):
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, check_slug=True, **kwargs):
+        """check_slug=False — уникальность slug проверит вызывающий код."""
+        super().__init__(*args, **kwargs)
+        self.check_slug = check_slug
+
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
+        """
+        Обрабатывает случай, если slug не уникален.
+
+        Пустой slug подбирает модель при сохранении.
+        """
+        slug = self.cleaned_data.get('slug')
+        if slug and self.check_slug and Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
             raise ValidationError(slug + WARNING)
         return slug
+
+    def _get_validation_exclusions(self):
+        # Уникальность slug уже проверена в clean_slug.
+        return [*super()._get_validation_exclusions(), 'slug']
+
+
+class NotesImportForm(forms.Form):
+    """Файл JSONL с заметками, полученный выгрузкой."""
+    file = forms.FileField(label='Файл с заметками')
@@ -0,0 +1,193 @@
+"""
+История изменений заметок.
+
+Каждые NOTES_REVISION_SNAPSHOT_INTERVAL версий текст сохраняется
+целиком, между снимками — построчная разница с предыдущей версией,
+сжатая zlib. Любая версия собирается из ближайшего снимка и не более
+чем интервала разниц, прочитанных одним запросом.
+
+Версию пишет Note.save() в транзакции сохранения заметки, пакетные
+пути batch и transfer — record_many() в транзакции bulk_create и
+bulk_update. Без версии остаются QuerySet.update() и загрузка фикстур:
+следующее сохранение через save() запишет версию с текстом на тот
+момент.
+"""
+import json
+import zlib
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .models import Note, NoteRevision
+
+# Операции построчной разницы.
+KEEP = '='
+DROP = '-'
+INSERT = '+'
+
+
+def _pack(value):
+    return zlib.compress(
+        json.dumps(value, ensure_ascii=False).encode('utf-8')
+    )
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+
+
+def make_delta(old, new):
+    """Разница между текстами: сколько строк взять, пропустить, вставить."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    delta = []
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == 'equal':
+            delta.append((KEEP, old_end - old_start))
+            continue
+        if old_end > old_start:
+            delta.append((DROP, old_end - old_start))
+        if new_end > new_start:
+            delta.append((INSERT, ''.join(new_lines[new_start:new_end])))
+    return delta
+
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    position = 0
+    parts = []
+    for op, value in delta:
+        if op == KEEP:
+            parts.extend(old_lines[position:position + value])
+            position += value
+        elif op == DROP:
+            position += value
+        else:
+            parts.append(value)
+    return ''.join(parts)
+
+
+def _chain(note_id, number=None):
+    """
+    Версии от ближайшего снимка до number включительно, одним запросом.
+
+    Без number — до последней версии заметки.
+    """
+    revisions = NoteRevision.objects.filter(note_id=note_id)
+    if number is not None:
+        revisions = revisions.filter(number__lte=number)
+    snapshot = revisions.filter(is_snapshot=True).order_by(
+        '-number'
+    ).values('number')[:1]
+    return list(
+        revisions.filter(number__gte=Subquery(snapshot)).order_by(
+            'number'
+        ).values_list('number', 'title', 'is_snapshot', 'data')
+    )
+
+
+def _build(chain):
+    text = ''
+    for _, _, is_snapshot, data in chain:
+        value = _unpack(data)
+        text = value if is_snapshot else apply_delta(text, value)
+    return text
+
+
+def get_text(note_id, number):
+    """Текст заметки в версии number или None, если версии нет."""
+    chain = _chain(note_id, number)
+    if not chain or chain[-1][0] != number:
+        return None
+    return _build(chain)
+
+
+def _chains(note_ids):
+    """Цепочки версий от последнего снимка для нескольких заметок."""
+    snapshot = NoteRevision.objects.filter(
+        note_id=OuterRef('note_id'), is_snapshot=True
+    ).order_by('-number').values('number')[:1]
+    chains = defaultdict(list)
+    for note_id, *revision in NoteRevision.objects.filter(
+        note_id__in=note_ids, number__gte=Subquery(snapshot)
+    ).order_by('note_id', 'number').values_list(
+        'note_id', 'number', 'title', 'is_snapshot', 'data'
+    ):
+        chains[note_id].append(tuple(revision))
+    return chains
+
+
+def _next_revision(note, chain):
+    """
+    Несохранённая следующая версия заметки или None без изменений.
+
+    Снимок пишется для первой версии, после интервала разниц и когда
+    разница выходит не меньше самого текста.
+    """
+    snapshot = _pack(note.text)
+    if not chain:
+        return _revision(note, 1, True, snapshot)
+    last_number, last_title, _, _ = chain[-1]
+    old_text = _build(chain)
+    if last_title == note.title and old_text == note.text:
+        return None
+    number = last_number + 1
+    if len(chain) >= settings.NOTES_REVISION_SNAPSHOT_INTERVAL:
+        return _revision(note, number, True, snapshot)
+    delta = _pack(make_delta(old_text, note.text))
+    if len(delta) >= len(snapshot):
+        return _revision(note, number, True, snapshot)
+    return _revision(note, number, False, delta)
+
+
+def record(note):
+    """
+    Добавляет версию заметки, если заголовок или текст изменились.
+
+    Вызывается в транзакции после записи строки заметки: она блокирует
+    заметку до конца транзакции, и параллельное сохранение не получит
+    тот же номер.
+    """
+    revision = _next_revision(note, _chain(note.pk))
+    if revision is not None:
+        revision.save()
+    return revision
+
+
+def record_many(notes):
+    """
+    Версии пачки заметок: цепочки читаются одним запросом, версии
+    пишутся одним bulk_create.
+
+    Вызывается в транзакции после bulk_create или bulk_update заметок.
+    Ключи заметок после bulk_create SQLite не возвращает, их находит
+    запрос по slug.
+    """
+    created = {note.slug: note for note in notes if note.pk is None}
+    if created:
+        for slug, pk in Note.objects.filter(
+            slug__in=created
+        ).values_list('slug', 'pk'):
+            created[slug].pk = pk
+    # У новых заметок версий ещё нет.
+    chains = _chains([note.pk for note in notes if note.slug not in created])
+    revisions = [
+        _next_revision(note, chains.get(note.pk, ())) for note in notes
+    ]
+    return NoteRevision.objects.bulk_create(
+        [revision for revision in revisions if revision is not None]
+    )
+
+
+def _revision(note, number, is_snapshot, data):
+    return NoteRevision(
+        note=note,
+        number=number,
+        title=note.title,
+        is_snapshot=is_snapshot,
+        text_size=len(note.text),
+        data=data,
+    )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from notes import markdown, signals
+from notes.models import Note
+
+
+class Command(BaseCommand):
+    help = (
+        'Отрисовывает HTML текста заметок пачками. По умолчанию — только '
+        'заметки без HTML; с --all — все, например после изменения '
+        'разметки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перерисовать и заметки, у которых HTML уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        notes = Note.objects.only('id', 'author_id', 'text').order_by('id')
+        if not options['all']:
+            notes = notes.filter(text_html__isnull=True)
+        last_id = 0
+        rendered = 0
+        while True:
+            # Пачки по курсору на id: каждая читается по индексу, без OFFSET.
+            batch = list(notes.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for note in batch:
+                note.text_html = markdown.render(note.text)
+            with transaction.atomic():
+                Note.objects.bulk_update(batch, ('text_html',))
+                for author_id in {note.author_id for note in batch}:
+                    signals.invalidate(author_id)
+            last_id = batch[-1].id
+            rendered += len(batch)
+        self.stdout.write(
+            self.style.SUCCESS(f'Отрисовано заметок: {rendered}')
+        )
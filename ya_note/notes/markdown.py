@@ -0,0 +1,173 @@
+"""
+Отрисовка Markdown заметок в HTML.
+
+Поддерживается подмножество Markdown: заголовки, абзацы, списки,
+цитаты, блоки кода, горизонтальная черта, а в строке — код, жирный,
+курсив и ссылки. Весь текст пользователя экранируется до разбора, а
+теги выставляет только сам разборщик, поэтому результат безопасен
+без отдельной очистки HTML.
+"""
+import html
+import re
+
+HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+RULE = re.compile(r'^\s{0,3}([-*_])(\s*\1){2,}\s*$')
+FENCE = re.compile(r'^\s{0,3}```')
+QUOTE = re.compile(r'^\s{0,3}&gt;\s?')
+UNORDERED_ITEM = re.compile(r'^\s{0,3}[-*+]\s+(.*)$')
+ORDERED_ITEM = re.compile(r'^\s{0,3}\d{1,9}[.)]\s+(.*)$')
+
+CODE_SPAN = re.compile(r'(`+)(.+?)\1')
+LINK = re.compile(r'\[([^\]]+)\]\(([^)\s]+)\)')
+STRONG = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__')
+EMPHASIS = re.compile(
+    r'\*(?=\S)(.+?)(?<=\S)\*|(?<!\w)_(?=\S)(.+?)(?<=\S)_(?!\w)'
+)
+# Ссылки допускаются только с этими схемами или без схемы.
+SAFE_SCHEMES = ('http:', 'https:', 'mailto:')
+# Управляющие символы и пробел в начале адреса браузер отбрасывает, а
+# внутри адреса они позволяют спрятать схему от проверки.
+URL_STRIP = ''.join(map(chr, range(0x21)))
+UNSAFE_URL_CHAR = re.compile(r'[\x00-\x20\x7f\s]')
+# Всё до двоеточия, если перед ним нет «/», «?» или «#», — схема.
+URL_SCHEME = re.compile(r'^([^/?#]*):')
+# Метка сохранённого фрагмента; в экранированном тексте её быть не может.
+STASH = '\x00{}\x00'
+STASHED = re.compile('\x00(\\d+)\x00')
+
+
+def _safe_url(url):
+    """Адрес ссылки без ведущих управляющих символов; None — опасный."""
+    url = url.lstrip(URL_STRIP)
+    plain = html.unescape(url)
+    if not plain or UNSAFE_URL_CHAR.search(plain):
+        return None
+    scheme = URL_SCHEME.match(plain)
+    if scheme and f'{scheme.group(1).lower()}:' not in SAFE_SCHEMES:
+        return None
+    return url
+
+
+def _inline(text, stash=None):
+    """Строчная разметка в уже экранированном тексте."""
+    stash = [] if stash is None else stash
+
+    def keep(fragment):
+        stash.append(fragment)
+        return STASH.format(len(stash) - 1)
+
+    # Код и ссылки откладываются, чтобы разметка внутри них не менялась.
+    text = CODE_SPAN.sub(
+        lambda match: keep(f'<code>{match.group(2).strip()}</code>'), text
+    )
+
+    def link(match):
+        label = _inline(match.group(1), stash)
+        url = _safe_url(match.group(2))
+        if url is None:
+            return label
+        return keep(f'<a href="{url}" rel="nofollow noopener">{label}</a>')
+
+    text = LINK.sub(link, text)
+    text = STRONG.sub(
+        lambda match: f'<strong>{match.group(1) or match.group(2)}</strong>',
+        text
+    )
+    text = EMPHASIS.sub(
+        lambda match: f'<em>{match.group(1) or match.group(2)}</em>', text
+    )
+    while STASHED.search(text):
+        text = STASHED.sub(lambda match: stash[int(match.group(1))], text)
+    return text
+
+
+def _fence(lines, position):
+    end = position + 1
+    while end < len(lines) and not FENCE.match(lines[end]):
+        end += 1
+    code = '\n'.join(lines[position + 1:end])
+    return f'<pre><code>{code}</code></pre>', end + 1
+
+
+def _heading(lines, position):
+    heading = HEADING.match(lines[position])
+    level = len(heading.group(1))
+    return f'<h{level}>{_inline(heading.group(2))}</h{level}>', position + 1
+
+
+def _rule(lines, position):
+    return '<hr>', position + 1
+
+
+def _quote(lines, position):
+    quoted = []
+    while position < len(lines) and QUOTE.match(lines[position]):
+        quoted.append(QUOTE.sub('', lines[position], count=1))
+        position += 1
+    body = '\n'.join(_blocks(quoted))
+    return f'<blockquote>\n{body}\n</blockquote>', position
+
+
+def _list(pattern, tag):
+    def parse(lines, position):
+        items = []
+        while position < len(lines):
+            line = lines[position]
+            item = pattern.match(line)
+            if item:
+                items.append([item.group(1)])
+            elif line.startswith((' ', '\t')) and line.strip():
+                # Строка с отступом продолжает пункт списка.
+                items[-1].append(line.strip())
+            else:
+                break
+            position += 1
+        body = '\n'.join(
+            f'<li>{_inline(" ".join(item))}</li>' for item in items
+        )
+        return f'<{tag}>\n{body}\n</{tag}>', position
+    return parse
+
+
+# Блоки по порядку проверки: первая подходящая строка определяет блок.
+BLOCKS = (
+    (FENCE, _fence),
+    (HEADING, _heading),
+    (RULE, _rule),
+    (QUOTE, _quote),
+    (UNORDERED_ITEM, _list(UNORDERED_ITEM, 'ul')),
+    (ORDERED_ITEM, _list(ORDERED_ITEM, 'ol')),
+)
+
+
+def _paragraph(lines, position):
+    paragraph = [lines[position]]
+    position += 1
+    while position < len(lines) and lines[position].strip() and not any(
+        pattern.match(lines[position]) for pattern, _ in BLOCKS
+    ):
+        paragraph.append(lines[position])
+        position += 1
+    body = '<br>\n'.join(_inline(line.strip()) for line in paragraph)
+    return f'<p>{body}</p>', position
+
+
+def _blocks(lines):
+    position = 0
+    while position < len(lines):
+        if not lines[position].strip():
+            position += 1
+            continue
+        parse = next(
+            (parse for pattern, parse in BLOCKS
+             if pattern.match(lines[position])),
+            _paragraph
+        )
+        block, position = parse(lines, position)
+        yield block
+
+
+def render(text):
+    """HTML для текста заметки в Markdown."""
+    text = html.escape(text.replace('\r\n', '\n').replace('\r', '\n'))
+    return '\n'.join(_blocks(text.replace('\x00', '').split('\n')))
@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# Полнотекстовый индекс SQLite FTS5 по заметкам. Автор хранится в
+# отдельном индексируемом столбце как токен «u<id>», поэтому поиск
+# пересекает списки документов автора и слов запроса внутри индекса,
+# а не фильтрует чужие совпадения. Текст хранится с заменой ё на е.
+# Индекс поддерживают триггеры.
+
+
+def fold(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def values(prefix):
+    return (
+        f"'u' || {prefix}author_id, {fold(f'{prefix}title')}, "
+        f"{fold(f'{prefix}text')}"
+    )
+
+
+SQL = [
+    "CREATE VIRTUAL TABLE notes_note_fts USING fts5("
+    "owner, title, text, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO notes_note_fts(rowid, owner, title, text) "
+    f"SELECT id, {values('')} FROM notes_note",
+    "CREATE TRIGGER notes_note_fts_ai AFTER INSERT ON notes_note BEGIN "
+    "INSERT INTO notes_note_fts(rowid, owner, title, text) "
+    f"VALUES (new.id, {values('new.')}); "
+    "END",
+    "CREATE TRIGGER notes_note_fts_ad AFTER DELETE ON notes_note BEGIN "
+    "DELETE FROM notes_note_fts WHERE rowid = old.id; "
+    "END",
+    "CREATE TRIGGER notes_note_fts_au "
+    "AFTER UPDATE OF author_id, title, text ON notes_note BEGIN "
+    "DELETE FROM notes_note_fts WHERE rowid = old.id; "
+    "INSERT INTO notes_note_fts(rowid, owner, title, text) "
+    f"VALUES (new.id, {values('new.')}); "
+    "END",
+]
+
+REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS notes_note_fts_ai',
+    'DROP TRIGGER IF EXISTS notes_note_fts_ad',
+    'DROP TRIGGER IF EXISTS notes_note_fts_au',
+    'DROP TABLE IF EXISTS notes_note_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_note_author_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(SQL), run(REVERSE_SQL)),
+    ]
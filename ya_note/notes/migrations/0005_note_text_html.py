@@ -0,0 +1,38 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:21
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite добавляет столбец пересборкой таблицы notes_note, а вместе со
+# старой таблицей пропадают триггеры поискового индекса. Их создаём
+# заново после пересборки в обе стороны.
+search_index = import_module('notes.migrations.0003_search_index')
+restore_triggers = search_index.run(
+    search_index.REVERSE_SQL[:3] + [
+        statement for statement in search_index.SQL
+        if statement.startswith('CREATE TRIGGER')
+    ]
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_revision'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.AddField(
+            model_name='note',
+            name='text_html',
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='text',
+            field=models.TextField(help_text='Добавьте подробностей. Можно использовать Markdown', verbose_name='Текст'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from notes import markdown
+
+BATCH_SIZE = 500
+
+
+def rerender_links(apps, schema_editor):
+    # HTML со ссылками отрисован до исправления проверки схемы ссылок:
+    # в нём может оказаться javascript: за управляющим символом.
+    Note = apps.get_model('notes', 'Note')
+    notes = Note.objects.filter(text_html__contains='<a ').only('id', 'text')
+    batch = []
+    for note in notes.iterator(chunk_size=BATCH_SIZE):
+        note.text_html = markdown.render(note.text)
+        batch.append(note)
+        if len(batch) == BATCH_SIZE:
+            Note.objects.bulk_update(batch, ('text_html',))
+            batch = []
+    Note.objects.bulk_update(batch, ('text_html',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0005_note_text_html'),
+    ]
+
+    operations = [
+        migrations.RunPython(rerender_links, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
-from pytils.translit import slugify
+from . import slugs
+
+# Сколько раз подбирать slug заново, если его успел занять другой запрос.
+SLUG_ATTEMPTS = 3
 
 
 class Note(models.Model):
@@ -13,8 +16,10 @@ class Note(models.Model):
     )
     text = models.TextField(
         'Текст',
-        help_text='Добавьте подробностей'
+        help_text='Добавьте подробностей. Можно использовать Markdown'
     )
+    # HTML текста, отрисованный при сохранении; NULL — ещё не отрисован.
+    text_html = models.TextField(editable=False, null=True)
     slug = models.SlugField(
         'Адрес для страницы с заметкой',
         max_length=100,
@@ -26,13 +31,87 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Поиск по автору обслуживает составной индекс из Meta.
+        db_index=False,
     )
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+        )
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        note = super().from_db(db, field_names, values)
+        note._rendered_text = note.__dict__.get('text')
+        return note
+
+    def render_html(self):
+        """Отрисовывает text_html, если текст изменился с прошлой отрисовки."""
+        if self.text_html is not None and self.text == getattr(
+            self, '_rendered_text', None
+        ):
+            return False
+        # Разборщик Markdown загружается при первой отрисовке.
+        from . import markdown
+        self.text_html = markdown.render(self.text)
+        self._rendered_text = self.text
+        return True
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if self.render_html() and update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'text_html'}
+        from . import history
+        # Версия пишется в той же транзакции, что и заметка; внутри
+        # чужой транзакции лишняя точка сохранения не нужна.
+        with transaction.atomic(savepoint=False):
+            self._save_with_slug(*args, **kwargs)
+            history.record(self)
+
+    def _save_with_slug(self, *args, **kwargs):
+        if self.slug:
+            return super().save(*args, **kwargs)
+        for attempt in range(1, SLUG_ATTEMPTS + 1):
+            self.slug = slugs.allocate(
+                Note.objects.all(), self.title, exclude_pk=self.pk
+            )
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == SLUG_ATTEMPTS:
+                    raise
+
+
+class NoteRevision(models.Model):
+    """
+    Версия заметки.
+
+    Текст хранится сжатым: либо целиком (снимок), либо как разница с
+    предыдущей версией. Размер текста хранится отдельно, чтобы список
+    версий не читал их содержимое.
+    """
+    note = models.ForeignKey(
+        Note, on_delete=models.CASCADE, related_name='revisions'
+    )
+    number = models.PositiveIntegerField('Номер версии')
+    title = models.CharField('Заголовок', max_length=100)
+    created = models.DateTimeField('Дата изменения', auto_now_add=True)
+    is_snapshot = models.BooleanField(default=False)
+    text_size = models.PositiveIntegerField('Длина текста')
+    data = models.BinaryField()
+
+    class Meta:
+        ordering = ('note', 'number')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('note', 'number'), name='note_revision_number_unique'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.note_id} #{self.number}'
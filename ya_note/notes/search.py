@@ -0,0 +1,83 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Note
+
+_WORD = re.compile(r'\w+')
+
+# Маркеры подсветки, которых не бывает в тексте; заменяются на <mark>
+# после экранирования HTML.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_SEARCH_SQL = f'''
+    SELECT rowid,
+           snippet(notes_note_fts, 2, '{_MARK_START}', '{_MARK_END}',
+                   '…', 16)
+    FROM notes_note_fts
+    WHERE notes_note_fts MATCH %s
+    ORDER BY bm25(notes_note_fts, 0.0, 5.0, 1.0), rowid DESC
+    LIMIT %s OFFSET %s
+'''
+
+
+def build_query(author_id, text):
+    """
+    Запрос FTS5: слова ищутся как префиксы в заголовке и тексте.
+
+    Условие на автора входит в сам запрос к индексу. Пустая строка
+    даёт None.
+    """
+    terms = [
+        f'"{word}"*'
+        for word in _WORD.findall(text.lower().replace('ё', 'е'))
+    ]
+    if not terms:
+        return None
+    return f'owner : "u{author_id}" AND {{title text}} : ({" ".join(terms)})'
+
+
+def _highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(_MARK_START, '<mark>')
+        .replace(_MARK_END, '</mark>')
+    )
+
+
+def search(author, text, page=1, per_page=20):
+    """
+    Заметки автора, найденные по заголовку и тексту.
+
+    Возвращает список пар (заметка, фрагмент с подсветкой) для страницы
+    и признак того, что есть следующая страница.
+    """
+    query = build_query(author.pk, text)
+    if query is None:
+        return [], False
+    offset = (page - 1) * per_page
+    notes = Note.objects.filter(author=author).only('id', 'slug', 'title')
+    if connection.vendor != 'sqlite':
+        found = notes.filter(
+            Q(title__icontains=text) | Q(text__icontains=text)
+        ).order_by('-id')[offset:offset + per_page + 1]
+        results = [(note, '') for note in found]
+        return results[:per_page], len(results) > per_page
+    with connection.cursor() as cursor:
+        cursor.execute(_SEARCH_SQL, [query, per_page + 1, offset])
+        rows = cursor.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    # Повторная проверка автора по основной таблице — на случай, если
+    # индекс отстал от неё.
+    notes_by_id = notes.in_bulk([note_id for note_id, _ in rows])
+    results = [
+        (notes_by_id[note_id], _highlight(snippet))
+        for note_id, snippet in rows
+        if note_id in notes_by_id
+    ]
+    return results, has_next
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache
+from .models import Note
+
+
+def invalidate(author_id):
+    cache.invalidate(author_id)
+    # Повторная смена версии после коммита не даёт закешировать
+    # заметку, прочитанную параллельным запросом до фиксации изменений.
+    transaction.on_commit(lambda: cache.invalidate(author_id))
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_author_notes(sender, instance, **kwargs):
+    invalidate(instance.author_id)
@@ -0,0 +1,76 @@
+import re
+from functools import lru_cache
+
+from django.db.models import Q
+
+SLUG_MAX_LENGTH = 100
+# Сколько символов slug оставлять под суффикс «-N».
+SUFFIX_RESERVE = 5
+# Для заголовков, от которых после транслитерации ничего не осталось.
+DEFAULT_SLUG = 'note'
+_SUFFIX = re.compile(r'-(\d+)$')
+
+
+@lru_cache(maxsize=4096)
+def translit(title):
+    """Slug из заголовка; результат запоминается для повторных заголовков."""
+    # Пакет pytils целиком грузит и даты, и числительные: откладываем
+    # до первого заголовка без slug.
+    from pytils.translit import slugify
+    return slugify(title)[:SLUG_MAX_LENGTH] or DEFAULT_SLUG
+
+
+def _with_suffix(base, number):
+    suffix = f'-{number}'
+    return base[:SLUG_MAX_LENGTH - len(suffix)] + suffix
+
+
+def _candidates(base):
+    """Условие на slug, которые может занять заголовок с этой основой."""
+    stem = base[:SLUG_MAX_LENGTH - SUFFIX_RESERVE]
+    if stem != base:
+        # У длинной основы суффикс заменяет её конец, поэтому варианты
+        # с номером ищутся по общему началу; оно длинное и редкое.
+        return Q(slug__gte=stem, slug__lte=f'{stem}~')
+    # Варианты с номером лежат в диапазоне индекса от «base-0» до
+    # «base-:» («:» следует за «9»); регулярное выражение проверяется
+    # только на строках из диапазона и отсекает «base-1-что-то».
+    return Q(slug=base) | Q(
+        slug__gte=f'{base}-0', slug__lt=f'{base}-:',
+        slug__regex=rf'^{re.escape(base)}-\d+$',
+    )
+
+
+def allocate(queryset, title, exclude_pk=None):
+    """
+    Свободный slug для заголовка: сам slug или он же с номером.
+
+    Все занятые варианты читаются одним запросом по диапазону
+    уникального индекса; другие slug с тем же началом («note» и
+    «notebook») не читаются. Номер берётся на единицу больше
+    наибольшего занятого.
+    """
+    base = translit(title)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    taken = set(
+        queryset.filter(_candidates(base)).values_list('slug', flat=True)
+    )
+    if base not in taken:
+        return base
+    numbers = [1]
+    for slug in taken:
+        match = _SUFFIX.search(slug)
+        if match and slug == _with_suffix(base, match.group(1)):
+            numbers.append(int(match.group(1)))
+    number = max(numbers) + 1
+    while _with_suffix(base, number) in taken:
+        number += 1
+    return _with_suffix(base, number)
+
+
+def find_taken(queryset, slugs):
+    """Какие из slug уже заняты: словарь slug -> id заметки, один запрос."""
+    return dict(
+        queryset.filter(slug__in=list(slugs)).values_list('slug', 'pk')
+    )
@@ -0,0 +1,54 @@
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+QUERY_BUDGETS_PATH = Path(__file__).resolve().parent / 'query_budgets.json'
+# QUERY_BUDGETS_UPDATE=1 перезаписывает бюджеты измеренными значениями.
+QUERY_BUDGETS_UPDATE = bool(os.environ.get('QUERY_BUDGETS_UPDATE'))
+
+
+class QueryBudgetMixin:
+    """
+    Проверка бюджета SQL-запросов для страниц.
+
+    Бюджеты хранятся в query_budgets.json под ключом «метод имя_url».
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.query_budgets = json.loads(
+            QUERY_BUDGETS_PATH.read_text(encoding='utf-8')
+        )
+
+    @contextmanager
+    def assert_query_budget(self, name, method='GET'):
+        key = f'{method} {name}'
+        with CaptureQueriesContext(connection) as context:
+            yield
+        count = len(context.captured_queries)
+        if QUERY_BUDGETS_UPDATE:
+            budgets = json.loads(
+                QUERY_BUDGETS_PATH.read_text(encoding='utf-8')
+            )
+            budgets[key] = count
+            QUERY_BUDGETS_PATH.write_text(
+                json.dumps(budgets, indent=4, sort_keys=True) + '\n',
+                encoding='utf-8'
+            )
+            return
+        self.assertIn(
+            key, self.query_budgets, f'Нет бюджета запросов для {key}'
+        )
+        queries = '\n'.join(
+            query['sql'] for query in context.captured_queries
+        )
+        self.assertLessEqual(
+            count, self.query_budgets[key],
+            f'{key}: {count} запросов при бюджете '
+            f'{self.query_budgets[key]}:\n{queries}'
+        )
@@ -1,9 +1,27 @@
-from django.test import TestCase, Client
+import os
+import subprocess
+import sys
+from importlib import import_module
+from http import HTTPStatus
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import (
+    TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+)
+from django.template.response import TemplateResponse
 from django.urls import reverse
-from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+)
+from django.core.cache import cache
 
 from notes.models import Note
 from notes.forms import NoteForm
+from notes.views import async_note_detail
+from yacommon import executor
+from yacommon.middleware import CachedAuthenticationMiddleware
 
 User = get_user_model()
 
@@ -13,6 +31,7 @@ NAME_EDIT = 'notes:edit'
 NAME_DELETE = 'notes:delete'
 NAME_DETAIL = 'notes:detail'
 NAME_LIST = 'notes:list'
+NAME_SEARCH = 'notes:search'
 
 
 class TestContent(TestCase):
@@ -84,3 +103,193 @@ class TestListPage(TestCase):
                          response.context['object_list'])
         note_obj = response.context['object_list'][0]
         self.assertEqual(note_obj, self.first_author_note)
+
+
+class TestListPagination(TestCase):
+
+    NOTES_COUNT = 5
+    PER_PAGE = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        Note.objects.bulk_create(
+            Note(title=f'Заметка {index}', text='Длинный текст.',
+                 slug=f'note_{index}', author=cls.author)
+            for index in range(cls.NOTES_COUNT)
+        )
+        cls.url = reverse(NAME_LIST)
+
+    def test_list_page_loads_only_displayed_fields(self):
+        response = self.author_client.get(self.url)
+        note = response.context['object_list'][0]
+        self.assertEqual(
+            note.get_deferred_fields(), {'text', 'text_html', 'author_id'}
+        )
+
+    def test_list_page_keyset_pagination(self):
+        with self.settings(NOTES_COUNT_ON_LIST_PAGE=self.PER_PAGE):
+            response = self.author_client.get(self.url)
+            first_page = response.context['page']
+            self.assertIsNone(first_page.before)
+            response = self.author_client.get(
+                self.url, {'after': first_page.after}
+            )
+            second_page = response.context['page']
+            self.assertGreater(
+                second_page.object_list[0].id,
+                first_page.object_list[-1].id
+            )
+            response = self.author_client.get(
+                self.url, {'before': second_page.before}
+            )
+            self.assertEqual(
+                response.context['object_list'], first_page.object_list
+            )
+
+
+class TestSearch(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.other_author = User.objects.create(username='Другой автор')
+        cls.note = Note.objects.create(
+            title='Список покупок', text='Купить ёлку и молоко.',
+            slug='shopping', author=cls.author
+        )
+        cls.other_note = Note.objects.create(
+            title='Покупки', text='Купить елку.',
+            slug='other_shopping', author=cls.other_author
+        )
+        cls.url = reverse(NAME_SEARCH)
+
+    def found_notes(self, query):
+        response = self.author_client.get(self.url, {'q': query})
+        return [note for note, _ in response.context['results']]
+
+    def test_search_finds_only_own_notes(self):
+        self.assertEqual(self.found_notes('елк'), [self.note])
+
+    def test_search_highlights_matches(self):
+        response = self.author_client.get(self.url, {'q': 'молоко'})
+        _, snippet = response.context['results'][0]
+        self.assertIn('<mark>молоко</mark>', snippet)
+
+    def test_search_index_follows_edits(self):
+        self.note.text = 'Купить хлеб.'
+        self.note.save()
+        self.assertEqual(self.found_notes('молоко'), [])
+        self.assertEqual(self.found_notes('хлеб'), [self.note])
+        self.note.delete()
+        self.assertEqual(self.found_notes('хлеб'), [])
+
+
+@override_settings(NOTES_DETAIL_CACHE='default')
+class TestDetailCache(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор заметки')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader = User.objects.create(username='Читатель')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.note = Note.objects.create(
+            title='Заголовок', text='Текст', slug='cached', author=cls.author
+        )
+        cls.url = reverse(NAME_DETAIL, args=(cls.note.slug,))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cached_page_skips_note_query(self):
+        first = self.author_client.get(self.url)
+        # Остаются только запросы сессии и пользователя.
+        with self.assertNumQueries(2):
+            second = self.author_client.get(self.url)
+        self.assertEqual(first.content, second.content)
+
+    def test_note_write_invalidates_page(self):
+        self.author_client.get(self.url)
+        self.author_client.post(
+            reverse(NAME_EDIT, args=(self.note.slug,)),
+            {'title': 'Новый заголовок', 'text': 'Новый текст',
+             'slug': self.note.slug}
+        )
+        response = self.author_client.get(self.url)
+        self.assertContains(response, 'Новый текст')
+
+    def test_other_author_not_served_from_cache(self):
+        self.author_client.get(self.url)
+        response = self.reader_client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+@override_settings(
+    NOTES_DETAIL_CACHE='default',
+    SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+)
+class TestAsyncNoteDetail(TransactionTestCase):
+    # Пул потоков открывает свои соединения с базой, поэтому данные
+    # теста должны быть зафиксированы.
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='Автор заметки')
+        self.note = Note.objects.create(
+            title='Заголовок', text='Текст', slug='async', author=self.author
+        )
+
+    def get(self):
+        request = RequestFactory().get(
+            reverse(NAME_DETAIL, args=(self.note.slug,))
+        )
+        # Сессия в подписанной cookie, как при DJANGO_CACHED_AUTH=1.
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(self.author.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = self.author.get_session_auth_hash()
+        request.session = session
+        CachedAuthenticationMiddleware(lambda request: None).process_request(
+            request
+        )
+        return async_to_sync(async_note_detail)(request, slug=self.note.slug)
+
+    def test_cache_hit_served_without_template(self):
+        first = self.get()
+        self.assertIsInstance(first, TemplateResponse)
+        second = self.get()
+        self.assertNotIsInstance(second, TemplateResponse)
+        self.assertEqual(first.content, second.content)
+
+    def test_cache_hit_does_not_use_pool(self):
+        first = self.get()
+        with mock.patch.object(
+            executor, 'run', side_effect=AssertionError('пул потоков')
+        ):
+            second = self.get()
+        self.assertNotIsInstance(second, TemplateResponse)
+        self.assertEqual(first.content, second.content)
+
+
+class TestStartup(TestCase):
+
+    def test_optional_modules_are_not_imported_on_startup(self):
+        code = (
+            'import sys, django; django.setup(); '
+            'from django.urls import get_resolver; '
+            'get_resolver().url_patterns; '
+            'print(*sorted({"pytils", "notes.markdown"} & set(sys.modules)))'
+        )
+        completed = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'yanote.settings'},
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(completed.stdout.strip(), '')
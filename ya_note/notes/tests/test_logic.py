@@ -1,13 +1,25 @@
-from django.test import TestCase, Client
+from django.test import (
+    TestCase, TransactionTestCase, Client, override_settings
+)
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 
+import io
+import json
 from http import HTTPStatus
+from unittest import mock
 
 from pytils.translit import slugify
 
-from notes.models import Note
+from notes import history, markdown, slugs
+from notes.models import Note, NoteRevision
 from notes.forms import WARNING
+from notes.transfer import DUPLICATE
+from yacommon import routers
+from yacommon.middleware import PIN_COOKIE
 
 User = get_user_model()
 
@@ -136,3 +148,463 @@ class TestNoteAdd(TestCase):
         self.assertEqual(note_count, 1)
         note = Note.objects.get()
         self.assertEqual(note.slug, slugify(note.title)[:100])
+
+
+class TestSlugAllocation(TestCase):
+
+    TITLE = 'Заметка'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.base_slug = slugify(cls.TITLE)
+
+    def test_empty_slugs_get_numbered_suffixes(self):
+        notes = [
+            Note.objects.create(title=self.TITLE, text='Текст',
+                                author=self.author)
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            [note.slug for note in notes],
+            [self.base_slug, f'{self.base_slug}-2', f'{self.base_slug}-3']
+        )
+
+    def test_allocation_takes_one_query(self):
+        Note.objects.create(title=self.TITLE, text='Текст',
+                            author=self.author)
+        Note.objects.create(title='Заметка о другом', text='Текст',
+                            author=self.author)
+        with self.assertNumQueries(1):
+            slug = slugs.allocate(Note.objects.all(), self.TITLE)
+        self.assertEqual(slug, f'{self.base_slug}-2')
+
+    def test_unrelated_slugs_with_same_prefix_are_not_read(self):
+        for slug in ('', '-2', '-7-plan', 'book', '-x', '-10'):
+            Note.objects.create(title='Заметка', text='Текст',
+                                slug=self.base_slug + slug,
+                                author=self.author)
+        with self.assertNumQueries(1):
+            taken = slugs.allocate(Note.objects.all(), self.TITLE)
+        self.assertEqual(taken, f'{self.base_slug}-11')
+        read = set(Note.objects.filter(
+            slugs._candidates(self.base_slug)
+        ).values_list('slug', flat=True))
+        self.assertEqual(read, {
+            self.base_slug, f'{self.base_slug}-2', f'{self.base_slug}-10'
+        })
+
+    def test_long_titles_keep_slug_length(self):
+        title = 'а' * 150
+        first = Note.objects.create(title=title, text='Текст',
+                                    author=self.author)
+        second = Note.objects.create(title=title, text='Текст',
+                                     author=self.author)
+        self.assertEqual(len(first.slug), 100)
+        self.assertEqual(len(second.slug), 100)
+        self.assertTrue(second.slug.endswith('-2'))
+
+    def test_save_retries_on_slug_collision(self):
+        Note.objects.create(title=self.TITLE, text='Текст',
+                            author=self.author)
+        # Первый подбор «проигрывает гонку» и возвращает занятый slug.
+        with mock.patch.object(
+            slugs, 'allocate',
+            side_effect=[self.base_slug, f'{self.base_slug}-2']
+        ):
+            note = Note.objects.create(title=self.TITLE, text='Текст',
+                                       author=self.author)
+        self.assertEqual(note.slug, f'{self.base_slug}-2')
+
+
+class TestNoteBatch(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.other_author = User.objects.create(username='Другой автор')
+        cls.note = Note.objects.create(
+            title='Старая заметка', text='Текст', slug='old',
+            author=cls.author
+        )
+        cls.other_note = Note.objects.create(
+            title='Чужая заметка', text='Текст', slug='foreign',
+            author=cls.other_author
+        )
+        cls.url = reverse('notes:batch')
+
+    def post_batch(self, operations, client=None):
+        return (client or self.author_client).post(
+            self.url,
+            data=json.dumps({'operations': operations}),
+            content_type='application/json'
+        )
+
+    def test_batch_applies_all_operations(self):
+        operations = [
+            {'op': 'create', 'data': {'title': 'Первая', 'text': 'Т',
+                                      'slug': 'first'}},
+            {'op': 'create', 'data': {'title': 'Вторая', 'text': 'Т'}},
+            {'op': 'update', 'slug': 'old',
+             'data': {'title': 'Новая', 'text': 'Новый текст',
+                      'slug': 'old'}},
+        ]
+        with self.assertNumQueries(17):
+            response = self.post_batch(operations)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = response.json()
+        self.assertTrue(data['applied'])
+        self.assertEqual(
+            [result['status'] for result in data['results']], ['ok'] * 3
+        )
+        self.assertEqual(data['results'][1]['slug'], slugify('Вторая'))
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 3)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.text, 'Новый текст')
+
+    def test_batch_records_revisions(self):
+        operations = [
+            {'op': 'create', 'data': {'title': 'Первая', 'text': 'Т',
+                                      'slug': 'first'}},
+            {'op': 'update', 'slug': 'old',
+             'data': {'title': 'Старая заметка', 'text': 'Новый текст',
+                      'slug': 'old'}},
+        ]
+        response = self.post_batch(operations)
+        self.assertTrue(response.json()['applied'])
+        self.assertEqual(
+            list(self.note.revisions.values_list('number', flat=True)),
+            [1, 2]
+        )
+        self.assertEqual(history.get_text(self.note.pk, 2), 'Новый текст')
+        created = Note.objects.get(slug='first')
+        self.assertEqual(history.get_text(created.pk, 1), 'Т')
+
+    def test_batch_is_all_or_nothing(self):
+        operations = [
+            {'op': 'delete', 'slug': 'old'},
+            {'op': 'create', 'data': {'title': 'Дубль', 'text': 'Т',
+                                      'slug': 'foreign'}},
+            {'op': 'create', 'data': {'title': 'Первая', 'text': 'Т',
+                                      'slug': 'twice'}},
+            {'op': 'create', 'data': {'title': 'Вторая', 'text': 'Т',
+                                      'slug': 'twice'}},
+            {'op': 'delete', 'slug': 'foreign'},
+        ]
+        response = self.post_batch(operations)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        data = response.json()
+        self.assertFalse(data['applied'])
+        self.assertEqual(
+            [result['status'] for result in data['results']],
+            ['skipped', 'error', 'error', 'error', 'error']
+        )
+        self.assertEqual(
+            data['results'][1]['errors']['slug'][0]['message'],
+            'foreign' + WARNING
+        )
+        self.assertEqual(Note.objects.count(), 2)
+
+    def test_deleted_slug_can_be_reused_in_batch(self):
+        operations = [
+            {'op': 'delete', 'slug': 'old'},
+            {'op': 'create', 'data': {'title': 'Заново', 'text': 'Т',
+                                      'slug': 'old'}},
+        ]
+        response = self.post_batch(operations)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(Note.objects.get(slug='old').title, 'Заново')
+
+    def test_batch_rejects_malformed_request(self):
+        response = self.author_client.post(
+            self.url, data='не json', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_anonymous_user_cannot_use_batch(self):
+        response = self.post_batch([], client=self.client)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+
+class TestNotesTransfer(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.other_author = User.objects.create(username='Другой автор')
+        Note.objects.create(title='Первая', text='Текст 1', slug='first',
+                            author=cls.author)
+        Note.objects.create(title='Вторая', text='Текст 2', slug='second',
+                            author=cls.author)
+        Note.objects.create(title='Чужая', text='Текст', slug='foreign',
+                            author=cls.other_author)
+
+    def test_export_streams_only_own_notes(self):
+        response = self.author_client.get(reverse('notes:export'))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [
+                {'title': 'Первая', 'text': 'Текст 1', 'slug': 'first'},
+                {'title': 'Вторая', 'text': 'Текст 2', 'slug': 'second'},
+            ]
+        )
+
+    def test_import_uses_slug_rules(self):
+        records = [
+            {'title': 'Новая', 'text': 'Текст', 'slug': 'new'},
+            {'title': 'Копия', 'text': 'Текст', 'slug': 'foreign'},
+            {'title': 'Первая', 'text': 'Текст', 'slug': ''},
+            {'title': 'Без текста'},
+        ]
+        content = '\n'.join(
+            json.dumps(record, ensure_ascii=False) for record in records
+        ) + '\nне json\n'
+        upload = SimpleUploadedFile('notes.jsonl', content.encode())
+        with self.settings(NOTES_IMPORT_BATCH_SIZE=2):
+            response = self.author_client.post(
+                reverse('notes:import'), {'file': upload}
+            )
+        result = response.context['result']
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.skipped, 3)
+        self.assertIn('foreign' + WARNING, result.errors[0])
+        self.assertTrue(
+            Note.objects.filter(author=self.author,
+                                slug=f'{slugify("Первая")}').exists()
+        )
+        self.assertEqual(Note.objects.filter(author=self.author).count(), 4)
+        new_note = Note.objects.get(slug='new')
+        self.assertEqual(history.get_text(new_note.pk, 1), 'Текст')
+
+    def test_import_keeps_first_of_repeated_slugs(self):
+        records = [
+            {'title': 'Раз', 'text': 'Текст', 'slug': 'repeat'},
+            {'title': 'Два', 'text': 'Текст', 'slug': 'repeat'},
+            {'title': 'Три', 'text': 'Текст', 'slug': 'repeat'},
+        ]
+        content = '\n'.join(json.dumps(record) for record in records)
+        upload = SimpleUploadedFile('notes.jsonl', content.encode())
+        with self.settings(NOTES_IMPORT_BATCH_SIZE=2):
+            response = self.author_client.post(
+                reverse('notes:import'), {'file': upload}
+            )
+        result = response.context['result']
+        self.assertEqual((result.created, result.skipped), (1, 2))
+        self.assertEqual(result.errors, [
+            f'Строка {number}: repeat{DUPLICATE}' for number in (2, 3)
+        ])
+        self.assertEqual(Note.objects.get(slug='repeat').title, 'Раз')
+
+    def test_import_reports_non_utf8_lines(self):
+        content = (
+            json.dumps({'title': 'Новая', 'text': 'Текст'}).encode() + b'\n'
+            + 'Заметка'.encode('cp1251') + b'\n'
+        )
+        upload = SimpleUploadedFile('notes.jsonl', content)
+        response = self.author_client.post(
+            reverse('notes:import'), {'file': upload}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        result = response.context['result']
+        self.assertEqual((result.created, result.skipped), (1, 1))
+        self.assertIn('Строка 2', result.errors[0])
+
+
+@override_settings(NOTES_REVISION_SNAPSHOT_INTERVAL=4)
+class TestNoteHistory(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+
+    def test_every_revision_restored(self):
+        lines = [f'Строка {number}\n' for number in range(50)]
+        note = Note.objects.create(
+            title='Заметка', text=''.join(lines), slug='history',
+            author=self.author
+        )
+        texts = [note.text]
+        for number in range(10):
+            lines[number * 3] = f'Изменённая строка {number}\n'
+            note.text = ''.join(lines)
+            note.save()
+            texts.append(note.text)
+        revisions = NoteRevision.objects.filter(note=note)
+        self.assertEqual(revisions.count(), len(texts))
+        self.assertEqual(
+            list(revisions.filter(is_snapshot=True).values_list(
+                'number', flat=True
+            )),
+            [1, 5, 9]
+        )
+        for number, text in enumerate(texts, start=1):
+            with self.subTest(number=number):
+                with self.assertNumQueries(1):
+                    self.assertEqual(history.get_text(note.pk, number), text)
+
+    def test_unchanged_save_not_recorded(self):
+        note = Note.objects.create(
+            title='Заметка', text='Текст', slug='same', author=self.author
+        )
+        note.save()
+        self.assertEqual(NoteRevision.objects.filter(note=note).count(), 1)
+
+    def test_history_page_lists_revisions_without_bodies(self):
+        note = Note.objects.create(
+            title='Заметка', text='Текст', slug='page', author=self.author
+        )
+        note.text = 'Новый текст'
+        note.save()
+        response = self.author_client.get(
+            reverse('notes:history', args=(note.slug,))
+        )
+        revisions = list(response.context['revisions'])
+        self.assertEqual([rev.number for rev in revisions], [2, 1])
+        self.assertIn('data', revisions[0].get_deferred_fields())
+        response = self.author_client.get(
+            reverse('notes:revision', args=(note.slug, 1))
+        )
+        self.assertEqual(response.context['text'], 'Текст')
+
+
+class TestNoteHistoryTransaction(TransactionTestCase):
+
+    def test_note_and_revision_saved_together(self):
+        author = User.objects.create(username='Автор')
+        note = Note.objects.create(
+            title='Заметка', text='Текст', slug='atomic', author=author
+        )
+        note.text = 'Новый текст'
+        # Параллельное сохранение успело занять номер версии.
+        with mock.patch.object(
+            history, 'record', side_effect=IntegrityError
+        ):
+            with self.assertRaises(IntegrityError):
+                note.save()
+        note.refresh_from_db()
+        self.assertEqual(note.text, 'Текст')
+        self.assertEqual(note.revisions.count(), 1)
+
+
+class TestMarkdown(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+
+    def test_render_is_sanitised(self):
+        html = markdown.render(
+            '# Заголовок\n\n**жирный** <script>alert(1)</script>\n'
+            '[сайт](https://example.com) [плохо](javascript:alert)'
+        )
+        self.assertIn('<h1>Заголовок</h1>', html)
+        self.assertIn('<strong>жирный</strong>', html)
+        self.assertIn('&lt;script&gt;', html)
+        self.assertIn('<a href="https://example.com"', html)
+        self.assertNotIn('javascript', html)
+
+    def test_link_scheme_cannot_be_hidden(self):
+        for url in (
+            '\x01javascript:alert%28document.cookie%29',
+            ' \x1fjavascript:alert(1)',
+            'java\tscript:alert(1)',
+            'JaVaScRiPt:alert(1)',
+            'data:text/html,x',
+        ):
+            with self.subTest(url=url):
+                self.assertNotIn('<a', markdown.render(f'[click]({url})'))
+        self.assertIn(
+            '<a href="/notes/?page=2#top"',
+            markdown.render('[a](/notes/?page=2#top)')
+        )
+        self.assertIn(
+            '<a href="https://example.com"',
+            markdown.render('[a](\x01https://example.com)')
+        )
+
+    def test_html_rendered_only_when_text_changes(self):
+        note = Note.objects.create(
+            title='Заметка', text='*Текст*', slug='md', author=self.author
+        )
+        self.assertEqual(note.text_html, '<p><em>Текст</em></p>')
+        note = Note.objects.get(pk=note.pk)
+        with mock.patch(
+            'notes.markdown.render', wraps=markdown.render
+        ) as render:
+            note.title = 'Новый заголовок'
+            note.save()
+            render.assert_not_called()
+            note.text = 'Другой текст'
+            note.save()
+            render.assert_called_once_with('Другой текст')
+
+    def test_detail_page_serves_stored_html(self):
+        note = Note.objects.create(
+            title='Заметка', text='- пункт', slug='list', author=self.author
+        )
+        with mock.patch(
+            'notes.markdown.render', wraps=markdown.render
+        ) as render:
+            response = self.author_client.get(
+                reverse('notes:detail', args=(note.slug,))
+            )
+            render.assert_not_called()
+        self.assertContains(response, '<li>пункт</li>')
+
+    def test_backfill_command(self):
+        note = Note.objects.create(
+            title='Заметка', text='`код`', slug='code', author=self.author
+        )
+        Note.objects.filter(pk=note.pk).update(text_html=None)
+        call_command('render_notes', batch_size=1, stdout=io.StringIO())
+        note.refresh_from_db()
+        self.assertEqual(note.text_html, '<p><code>код</code></p>')
+
+
+class TestSqlitePragmas(TestCase):
+
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            # 1 — NORMAL.
+            self.assertEqual(
+                cursor.execute('PRAGMA synchronous').fetchone(), (1,)
+            )
+            self.assertEqual(
+                cursor.execute('PRAGMA busy_timeout').fetchone(), (5000,)
+            )
+
+
+@override_settings(DATABASE_REPLICA='replica')
+class TestReplicaRouter(TransactionTestCase):
+    # Без транзакции теста: внутри неё чтение и так идёт из default.
+
+    def test_reads_replica_until_write(self):
+        router = routers.PrimaryReplicaRouter()
+        routers.begin_request()
+        try:
+            self.assertEqual(router.db_for_read(Note), 'replica')
+            self.assertIsNone(router.db_for_read(User))
+            self.assertEqual(router.db_for_write(Note), 'default')
+            self.assertEqual(router.db_for_read(Note), 'default')
+        finally:
+            routers.end_request()
+
+    def test_write_pins_user_to_primary(self):
+        client = Client()
+        client.force_login(User.objects.create(username='Автор'))
+        response = client.post(
+            reverse('notes:add'), {'title': 'Заметка', 'text': 'Текст'}
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = client.get(reverse('notes:list'))
+        self.assertTrue(response.wsgi_request.db_state.pinned)
@@ -1,8 +1,28 @@
-from django.test import TestCase, Client
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import (
+    TestCase, TransactionTestCase, Client, override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
 
 from notes.models import Note
+from yacommon.pagination import KeysetPaginator
+from notes.tests.mixins import QueryBudgetMixin
+from yacommon import auth, profiling
+from yacommon.middleware import RequestProfileMiddleware
 
 from http import HTTPStatus
 
@@ -19,6 +39,8 @@ NAME_DELETE = 'notes:delete'
 NAME_DETAIL = 'notes:detail'
 NAME_LIST = 'notes:list'
 NAME_SUCCESS = 'notes:success'
+NAME_SEARCH = 'notes:search'
+NAME_HISTORY = 'notes:history'
 
 
 class TestRoutes(TestCase):
@@ -55,8 +77,10 @@ class TestRoutes(TestCase):
             NAME_EDIT: (self.note.slug,),
             NAME_DETAIL: (self.note.slug,),
             NAME_DELETE: (self.note.slug,),
+            NAME_HISTORY: (self.note.slug,),
             NAME_LIST: None,
-            NAME_SUCCESS: None
+            NAME_SUCCESS: None,
+            NAME_SEARCH: None,
         }
         for name, args in names.items():
             with self.subTest():
@@ -70,7 +94,8 @@ class TestRoutes(TestCase):
         names = [
             NAME_ADD,
             NAME_LIST,
-            NAME_SUCCESS
+            NAME_SUCCESS,
+            NAME_SEARCH,
         ]
         for name in names:
             with self.subTest():
@@ -82,7 +107,8 @@ class TestRoutes(TestCase):
         names = (
             (NAME_EDIT, (self.note.slug,)),
             (NAME_DETAIL, (self.note.slug,)),
-            (NAME_DELETE, (self.note.slug,))
+            (NAME_DELETE, (self.note.slug,)),
+            (NAME_HISTORY, (self.note.slug,)),
         )
         user_statuses = (
             (self.author, HTTPStatus.OK),
@@ -95,3 +121,203 @@ class TestRoutes(TestCase):
                     url = reverse(name, args=args)
                     response = self.client.get(url)
                     self.assertEqual(response.status_code, status)
+
+
+class TestQueryBudgets(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Тестовый пользователь')
+        cls.note = Note.objects.create(
+            title='Тестовая заметка',
+            text='Просто текст.',
+            slug='testNote',
+            author=cls.author
+        )
+        cls.form_data = {
+            'title': 'Новая заметка',
+            'text': 'Новый текст.',
+        }
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def test_get_query_budgets(self):
+        names = (
+            (NAME_HOME, None),
+            (NAME_ADD, None),
+            (NAME_EDIT, (self.note.slug,)),
+            (NAME_DETAIL, (self.note.slug,)),
+            (NAME_DELETE, (self.note.slug,)),
+            (NAME_LIST, None),
+            (NAME_SUCCESS, None),
+        )
+        for name, args in names:
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                with self.assert_query_budget(name):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_query_budgets(self):
+        names = (
+            (NAME_ADD, None, 'newNote'),
+            (NAME_EDIT, (self.note.slug,), self.note.slug),
+            (NAME_DELETE, (self.note.slug,), ''),
+        )
+        for name, args, slug in names:
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                data = {**self.form_data, 'slug': slug}
+                with self.assert_query_budget(name, 'POST'):
+                    response = self.client.post(url, data=data)
+                self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+CACHED_AUTH_SETTINGS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+    'MIDDLEWARE': [
+        'yacommon.middleware.CachedAuthenticationMiddleware'
+        if name == 'django.contrib.auth.middleware.AuthenticationMiddleware'
+        else name
+        for name in settings.MIDDLEWARE
+    ],
+}
+
+
+class TestCachedAuth(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='Автор')
+        cls.note = Note.objects.create(
+            title='Заметка', text='Текст.', slug='cached_auth',
+            author=cls.author
+        )
+        cls.url = reverse(NAME_DETAIL, args=(cls.note.slug,))
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, client):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_cached_auth_saves_session_and_user_queries(self):
+        self.client.force_login(self.author)
+        default_count = self.count_queries(self.client)
+        with self.settings(**CACHED_AUTH_SETTINGS):
+            client = Client()
+            client.force_login(self.author)
+            # Первый запрос кладёт пользователя в кеш.
+            self.count_queries(client)
+            self.assertEqual(self.count_queries(client), default_count - 2)
+
+    @override_settings(**CACHED_AUTH_SETTINGS)
+    def test_password_change_invalidates_cached_user(self):
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.url)
+        self.author.set_password('new-password')
+        self.author.save()
+        response = client.get(self.url)
+        self.assertRedirects(
+            response, f'{reverse(NAME_LOGIN)}?next={self.url}'
+        )
+
+    @override_settings(**CACHED_AUTH_SETTINGS)
+    def test_logout_invalidates_cached_user(self):
+        client = Client()
+        client.force_login(self.author)
+        client.get(self.url)
+        key = auth.USER_KEY.format(pk=self.author.pk)
+        self.assertIsNotNone(cache.get(key))
+        client.get(reverse(NAME_LOGOUT))
+        self.assertIsNone(cache.get(key))
+
+
+class TestRequestProfile(TransactionTestCase):
+    # Под ASGI синхронная часть профилируемого запроса идёт в отдельном
+    # потоке со своим соединением, поэтому данные теста фиксируются.
+
+    def setUp(self):
+        self.author = User.objects.create(username='Автор')
+        self.url = reverse(NAME_LIST)
+        self.client.force_login(self.author)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.profile_dir = Path(directory.name) / 'profiles'
+        settings_override = self.settings(
+            REQUEST_PROFILE_DIR=self.profile_dir
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_profile_token_writes_profile(self):
+        response = self.client.get(
+            self.url, HTTP_X_PROFILE=profiling.make_token()
+        )
+        profile_id = response[profiling.RESPONSE_HEADER]
+        self.assertTrue((self.profile_dir / f'{profile_id}.folded').exists())
+        report = json.loads(
+            (self.profile_dir / f'{profile_id}.json').read_text()
+        )
+        self.assertEqual(report['status'], HTTPStatus.OK)
+        self.assertGreater(report['queries_count'], 0)
+        self.assertEqual(report['queries_count'], sum(
+            query['count'] for query in report['top_queries']
+        ))
+
+    def test_request_without_token_is_not_profiled(self):
+        for headers in ({}, {'HTTP_X_PROFILE': 'forged'}):
+            with self.subTest(headers=headers):
+                response = self.client.get(self.url, **headers)
+                self.assertNotIn(profiling.RESPONSE_HEADER, response)
+                self.assertFalse(self.profile_dir.exists())
+
+    def test_middleware_keeps_asgi_chain_async(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        # Синхронный экземпляр Django обернул бы в sync_to_async.
+        self.assertTrue(asyncio.iscoroutinefunction(
+            RequestProfileMiddleware(get_response)
+        ))
+        self.async_client.force_login(self.author)
+
+        async def get():
+            return await self.async_client.get(
+                self.url, **{'X-Profile': profiling.make_token()}
+            )
+
+        def slow(*args, **kwargs):
+            # Представление заведомо успевает попасть в выборку стеков.
+            time.sleep(0.05)
+            return KeysetPaginator(*args, **kwargs)
+
+        with mock.patch('notes.views.KeysetPaginator', slow):
+            response = async_to_sync(get)()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        profile_id = response[profiling.RESPONSE_HEADER]
+        report = json.loads(
+            (self.profile_dir / f'{profile_id}.json').read_text()
+        )
+        self.assertGreater(report['queries_count'], 0)
+        self.assertIn(
+            'notes.views:',
+            (self.profile_dir / f'{profile_id}.folded').read_text()
+        )
+
+    def test_prune_removes_oldest_profiles(self):
+        directory = self.profile_dir.parent
+        for number in range(4):
+            path = directory / f'{number}.json'
+            path.write_bytes(b'x' * 10)
+            os.utime(path, (number, number))
+        profiling.prune(directory, 25)
+        self.assertEqual(
+            sorted(path.name for path in directory.iterdir()),
+            ['2.json', '3.json']
+        )
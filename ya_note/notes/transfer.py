@@ -0,0 +1,126 @@
+"""Выгрузка заметок пользователя в JSONL и загрузка обратно."""
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from . import history, signals, slugs
+from .forms import WARNING, NoteForm
+from .models import Note
+
+EXPORT_FIELDS = ('title', 'text', 'slug')
+# Сколько ошибок показывать пользователю после загрузки.
+MAX_REPORTED_ERRORS = 20
+DUPLICATE = ' - такой slug уже встречался в файле выше.'
+
+
+def export_lines(author, chunk_size):
+    """
+    Заметки автора строками JSONL.
+
+    Заметки читаются курсором порциями по chunk_size, поэтому память
+    не зависит от размера аккаунта.
+    """
+    notes = Note.objects.filter(author=author).order_by('id').values(
+        *EXPORT_FIELDS
+    )
+    for note in notes.iterator(chunk_size=chunk_size):
+        yield json.dumps(note, ensure_ascii=False) + '\n'
+
+
+class ImportResult:
+    """Итоги загрузки заметок."""
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+        # Явные slug из файла, уже сохранённые этой загрузкой.
+        self.slugs = set()
+
+    def skip(self, line_number, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'Строка {line_number}: {message}')
+
+
+def _parse(lines, result):
+    """Проверенные формы NoteForm по строкам JSONL; ошибки — в result."""
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError:
+                result.skip(line_number, 'не в кодировке UTF-8.')
+                continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            result.skip(line_number, 'не JSON.')
+            continue
+        if not isinstance(data, dict):
+            result.skip(line_number, 'ожидается объект.')
+            continue
+        form = NoteForm(data, check_slug=False)
+        if not form.is_valid():
+            errors = '; '.join(
+                message for messages in form.errors.values()
+                for message in messages
+            )
+            result.skip(line_number, errors)
+            continue
+        yield line_number, form
+
+
+def _save_batch(author, batch, result):
+    """
+    Сохраняет пачку форм; занятые slug отсеиваются одним запросом.
+
+    Из повторов slug в файле сохраняется первая заметка.
+    """
+    wanted = [form.cleaned_data['slug'] for _, form in batch]
+    taken = slugs.find_taken(Note.objects.all(), filter(None, wanted))
+    created = []
+    auto_slug = []
+    for line_number, form in batch:
+        slug = form.cleaned_data['slug']
+        if slug in result.slugs:
+            result.skip(line_number, slug + DUPLICATE)
+            continue
+        if slug in taken:
+            result.skip(line_number, slug + WARNING)
+            continue
+        if slug:
+            result.slugs.add(slug)
+        note = form.save(commit=False)
+        note.author = author
+        note.render_html()
+        (created if slug else auto_slug).append(note)
+    with transaction.atomic():
+        Note.objects.bulk_create(created)
+        history.record_many(created)
+        # Пустой slug подбирает модель, уже с учётом slug этой пачки.
+        for note in auto_slug:
+            note.save()
+        # bulk_create не отправляет сигналы модели.
+        signals.invalidate(author.pk)
+    result.created += len(created) + len(auto_slug)
+
+
+def import_lines(author, lines, batch_size):
+    """
+    Загружает заметки из строк JSONL пачками по batch_size.
+
+    Действуют правила NoteForm: явно указанный занятый slug —
+    ошибка, пустой slug подбирается по заголовку. Каждая пачка
+    сохраняется в своей транзакции.
+    """
+    result = ImportResult()
+    forms = _parse(lines, result)
+    while True:
+        batch = list(islice(forms, batch_size))
+        if not batch:
+            return result
+        _save_batch(author, batch, result)
@@ -1,15 +1,34 @@
+from django.conf import settings
 from django.urls import path
 
 from notes import views
+from yacommon import executor
 
 app_name = 'notes'
 
+note_detail = views.NoteDetail.as_view()
+notes_list = views.NotesList.as_view()
+if settings.ASYNC_VIEWS:
+    note_detail = views.async_note_detail
+    # Список читается из базы на каждый запрос: всё одним заходом в пул.
+    notes_list = executor.as_async(notes_list)
+
 urlpatterns = [
     path('', views.Home.as_view(), name='home'),
     path('add/', views.NoteCreate.as_view(), name='add'),
     path('edit/<slug:slug>/', views.NoteUpdate.as_view(), name='edit'),
-    path('note/<slug:slug>/', views.NoteDetail.as_view(), name='detail'),
+    path('note/<slug:slug>/', note_detail, name='detail'),
     path('delete/<slug:slug>/', views.NoteDelete.as_view(), name='delete'),
-    path('notes/', views.NotesList.as_view(), name='list'),
+    path('history/<slug:slug>/', views.NoteHistory.as_view(), name='history'),
+    path(
+        'history/<slug:slug>/<int:number>/',
+        views.NoteRevisionDetail.as_view(),
+        name='revision'
+    ),
+    path('notes/', notes_list, name='list'),
+    path('search/', views.NoteSearch.as_view(), name='search'),
+    path('api/batch/', views.NoteBatch.as_view(), name='batch'),
+    path('export/', views.NotesExport.as_view(), name='export'),
+    path('import/', views.NotesImport.as_view(), name='import'),
     path('done/', views.NoteSuccess.as_view(), name='success'),
 ]
@@ -1,8 +1,20 @@
+import json
+from http import HTTPStatus
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import IntegrityError
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
 from django.urls import reverse_lazy
 from django.views import generic
 
-from .forms import NoteForm
+from yacommon import executor
+from yacommon.pagination import KeysetPaginator
+
+from . import batch, cache, history, search, transfer
+from .forms import NoteForm, NotesImportForm
 from .models import Note
 
 
@@ -25,6 +37,16 @@ class NoteBase(LoginRequiredMixin):
         """Пользователь может работать только со своими заметками."""
         return self.model.objects.filter(author=self.request.user)
 
+    def get_object(self, queryset=None):
+        """Заметка берётся из кеша автора, если он включён."""
+        if queryset is not None:
+            return super().get_object(queryset)
+        return cache.get_object(
+            self.request.user.pk,
+            self.kwargs[self.slug_url_kwarg],
+            super().get_object,
+        )
+
 
 class NoteCreate(NoteBase, generic.CreateView):
     """Добавление заметки."""
@@ -32,9 +54,7 @@ class NoteCreate(NoteBase, generic.CreateView):
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
@@ -53,7 +73,187 @@ class NotesList(NoteBase, generic.ListView):
     """Список всех заметок пользователя."""
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        """
+        Страница заметок пользователя.
+
+        Загружаем только поля, которые выводятся в списке; страницы
+        листаются по курсору на id.
+        """
+        paginator = KeysetPaginator(
+            super().get_queryset().only('id', 'slug', 'title'),
+            ('id',),
+            settings.NOTES_COUNT_ON_LIST_PAGE,
+        )
+        self.page = paginator.get_page(self.request.GET)
+        return self.page.object_list
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page'] = self.page
+        return context
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+    def get(self, request, *args, **kwargs):
+        key = cache.page_key(request.user.pk, kwargs[self.slug_url_kwarg])
+        if key is None:
+            return super().get(request, *args, **kwargs)
+        content = cache.get_page(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        response.add_post_render_callback(
+            lambda response: cache.set_page(key, response.content)
+        )
+        return response
+
+
+_note_detail_in_pool = executor.as_async(NoteDetail.as_view())
+
+
+def _cached_page(author_id, slug):
+    key = cache.page_key(author_id, slug)
+    return None if key is None else cache.get_page(key)
+
+
+async def async_note_detail(request, slug):
+    """
+    Асинхронный вариант NoteDetail.
+
+    С CachedAuthenticationMiddleware, сессией в подписанной cookie и
+    кешем в памяти процесса страница из кеша отдаётся, не покидая цикл
+    событий. Запрос к базе и отрисовка при промахе идут в пул.
+    """
+    page_cache = cache.get_cache()
+    auser = getattr(request, 'auser', None)
+    if page_cache is not None and auser is not None:
+        request.user = user = await auser()
+        if user.is_authenticated:
+            content = await executor.run_cached(
+                page_cache, _cached_page, user.pk, slug
+            )
+            if content is not None:
+                return HttpResponse(content)
+    return await _note_detail_in_pool(request, slug=slug)
+
+
+class NoteHistory(NoteBase, generic.DetailView):
+    """Список версий заметки без их содержимого."""
+    template_name = 'notes/history.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['revisions'] = self.object.revisions.only(
+            'note', 'number', 'title', 'created', 'text_size'
+        ).order_by('-number')
+        return context
+
+
+class NoteRevisionDetail(NoteBase, generic.DetailView):
+    """Заметка в одной из прошлых версий."""
+    template_name = 'notes/revision.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        revision = self.object.revisions.filter(
+            number=self.kwargs['number']
+        ).only('note', 'number', 'title', 'created').first()
+        if revision is None:
+            raise Http404('Такой версии нет.')
+        context['revision'] = revision
+        context['text'] = history.get_text(self.object.pk, revision.number)
+        # Прошлые версии открывают редко, их HTML не хранится.
+        from . import markdown
+        context['text_html'] = markdown.render(context['text'])
+        return context
+
+
+class NoteSearch(LoginRequiredMixin, generic.TemplateView):
+    """Поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        try:
+            page = int(self.request.GET.get('page', 1))
+        except ValueError:
+            raise Http404('Некорректный номер страницы.')
+        if page < 1:
+            raise Http404('Некорректный номер страницы.')
+        results, has_next = search.search(
+            self.request.user, query, page, settings.NOTES_COUNT_ON_LIST_PAGE
+        )
+        context.update(
+            query=query,
+            results=results,
+            page_number=page,
+            has_next=has_next,
+        )
+        return context
+
+
+class NoteBatch(LoginRequiredMixin, generic.View):
+    """
+    Пакетное изменение заметок в формате JSON.
+
+    Все операции проверяются правилами NoteForm и применяются в одной
+    транзакции; в ответе — результат по каждой операции.
+    """
+    raise_exception = True
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        try:
+            operations = json.loads(request.body)['operations']
+            applied, results = batch.run(
+                request.user, operations, settings.NOTES_BATCH_MAX_OPERATIONS
+            )
+        except (ValueError, KeyError, TypeError, batch.BatchError) as error:
+            return JsonResponse(
+                {'error': str(error)}, status=HTTPStatus.BAD_REQUEST
+            )
+        except IntegrityError:
+            return JsonResponse(
+                {'error': 'Конфликт с одновременным изменением, повторите.'},
+                status=HTTPStatus.CONFLICT
+            )
+        return JsonResponse(
+            {'applied': applied, 'results': results},
+            status=HTTPStatus.OK if applied else HTTPStatus.BAD_REQUEST
+        )
+
+
+class NotesExport(LoginRequiredMixin, generic.View):
+    """Выгрузка всех заметок пользователя в JSONL потоком."""
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            transfer.export_lines(
+                request.user, settings.NOTES_EXPORT_CHUNK_SIZE
+            ),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'attachment; filename="notes.jsonl"'
+        return response
+
+
+class NotesImport(LoginRequiredMixin, generic.FormView):
+    """Загрузка заметок из файла выгрузки."""
+    template_name = 'notes/import.html'
+    form_class = NotesImportForm
+
+    def form_valid(self, form):
+        # Загруженный файл читается построчно, целиком в память не попадает.
+        result = transfer.import_lines(
+            self.request.user,
+            form.cleaned_data['file'],
+            settings.NOTES_IMPORT_BATCH_SIZE,
+        )
+        return self.render_to_response(
+            self.get_context_data(form=form, result=result)
+        )
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    name = 'yacommon'
+
+    def ready(self):
+        from . import signals, sqlite  # noqa: F401
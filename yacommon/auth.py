@@ -0,0 +1,69 @@
+"""
+Пользователь запроса из кеша вместо чтения auth_user на каждый запрос.
+
+Закешированный пользователь сверяется с хешем из сессии, как это делает
+django.contrib.auth.get_user: при несовпадении (например, после смены
+пароля в другом процессе) пользователь читается из базы заново. Сигналы
+удаляют запись из кеша при сохранении пользователя и выходе.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+
+from . import executor
+
+USER_KEY = 'auth-user:{pk}'
+SIGNED_COOKIES = 'django.contrib.sessions.backends.signed_cookies'
+
+
+def get_cache():
+    return caches[settings.AUTH_USER_CACHE]
+
+
+def invalidate(user_id):
+    get_cache().delete(USER_KEY.format(pk=user_id))
+
+
+def get_cached_user(request):
+    """Пользователь из сессии и кеша или None, если нужна база."""
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return AnonymousUser()
+    user = get_cache().get(USER_KEY.format(pk=user_id))
+    if user is not None and constant_time_compare(
+        request.session.get(HASH_SESSION_KEY, ''),
+        user.get_session_auth_hash()
+    ):
+        return user
+    return None
+
+
+def get_user(request):
+    user = get_cached_user(request)
+    if user is not None:
+        return user
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        get_cache().set(
+            USER_KEY.format(pk=user.pk), user,
+            settings.AUTH_USER_CACHE_TIMEOUT
+        )
+    return user
+
+
+async def aget_user(request):
+    """
+    Асинхронный get_user.
+
+    Сессия в подписанной cookie и пользователь из кеша в памяти процесса
+    читаются в цикле событий; если нужна база, пользователь загружается
+    в пуле потоков.
+    """
+    if settings.SESSION_ENGINE == SIGNED_COOKIES:
+        user = await executor.run_cached(get_cache(), get_cached_user, request)
+        if user is not None:
+            return user
+    return await executor.run(get_user, request)
@@ -0,0 +1,88 @@
+"""
+Пул потоков для работы с базой в асинхронных представлениях.
+
+Под ASGI синхронное представление Django выполняет в общем пуле
+asgiref. Асинхронные варианты представлений отдают ORM и отрисовку
+шаблонов в отдельный пул ограниченного размера: число одновременных
+соединений с базой не превышает DB_THREADS.
+"""
+import asyncio
+import contextvars
+import functools
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+
+from . import profiling
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DB_THREADS,
+            thread_name_prefix='db',
+        )
+    return _executor
+
+
+def _call(func, args, kwargs):
+    try:
+        with profiling.attach(sys._getframe()):
+            return func(*args, **kwargs)
+    finally:
+        # Потоки пула живут дольше запроса: соединения закрываются по
+        # тем же правилам CONN_MAX_AGE, что и после обычного запроса.
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """Выполняет func в пуле, не занимая цикл событий."""
+    # Контекст передаётся в поток пула, как это делает sync_to_async.
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), context.run, _call, func, args, kwargs
+    )
+
+
+def in_memory(cache):
+    """Кеш в памяти процесса: обращение к нему не ждёт ввода-вывода."""
+    return isinstance(cache, (LocMemCache, DummyCache))
+
+
+async def run_cached(cache, func, *args, **kwargs):
+    """
+    Выполняет func, которая обращается только к кешу cache.
+
+    Кеш в памяти процесса читается прямо в цикле событий; у Django 3.2
+    нет асинхронного API кеша, поэтому сетевые бэкенды идут в пул.
+    """
+    if in_memory(cache):
+        return func(*args, **kwargs)
+    return await run(func, *args, **kwargs)
+
+
+def _render(view, request, args, kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+def as_async(view):
+    """
+    Асинхронный вариант синхронного представления.
+
+    Представление вместе с отрисовкой шаблона выполняется в пуле:
+    ленивые запросы из шаблона не попадают в цикл событий.
+    """
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await run(_render, view, request, args, kwargs)
+    return async_view
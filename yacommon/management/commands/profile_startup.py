@@ -0,0 +1,140 @@
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from statistics import median
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+import yacommon
+
+# Каталог с пакетом yacommon: дочерний процесс импортирует его
+# до загрузки настроек, которые добавляют этот каталог в sys.path.
+ROOT_DIR = Path(yacommon.__file__).resolve().parent.parent
+
+# Строка вывода python -X importtime: собственное и общее время в мкс.
+IMPORT_LINE = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)([\w.]+)$'
+)
+
+
+def parse_import_times(stderr):
+    """Время импорта модулей из вывода python -X importtime, в мс."""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = {
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'depth': len(indent) // 2,
+            }
+    return modules
+
+
+def summarize(runs):
+    """Медианы фаз и модулей по нескольким запускам."""
+    phases = {
+        name: median(run['phases'][name] for run, _ in runs)
+        for name in runs[0][0]['phases']
+    }
+    modules = []
+    for name, first in runs[0][1].items():
+        times = [found[name] for _, found in runs if name in found]
+        modules.append({
+            'module': name,
+            'self_ms': median(item['self_ms'] for item in times),
+            'cumulative_ms': median(item['cumulative_ms'] for item in times),
+            'depth': first['depth'],
+        })
+    modules.sort(key=lambda item: -item['self_ms'])
+    packages = defaultdict(float)
+    for module in modules:
+        packages[module['module'].split('.')[0]] += module['self_ms']
+    return {
+        'phases_ms': phases,
+        'total_ms': sum(phases.values()),
+        'packages_ms': dict(
+            sorted(packages.items(), key=lambda item: -item[1])
+        ),
+        'modules': modules,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет холодный старт в отдельных процессах: импорт модулей, '
+        'загрузку настроек, реестра приложений, URL-конфигурации и первый '
+        'запрос. Печатает отчёт и пишет JSON для сравнения между релизами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument(
+            '--runs', type=int, default=5,
+            help='Сколько раз запускать процесс; в отчёте медианы.'
+        )
+        parser.add_argument('--output', default='startup_profile.json')
+        parser.add_argument('--top', type=int, default=20)
+
+    def measure(self, path):
+        python_path = os.pathsep.join(filter(None, (
+            str(ROOT_DIR), os.environ.get('PYTHONPATH')
+        )))
+        completed = subprocess.run(
+            [
+                sys.executable, '-X', 'importtime', '-c',
+                f'from yacommon.startup import main; main({path!r})',
+            ],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'PYTHONPATH': python_path},
+            capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(completed.stderr[-2000:])
+        return (
+            json.loads(completed.stdout),
+            parse_import_times(completed.stderr),
+        )
+
+    def handle(self, *args, **options):
+        runs = [
+            self.measure(options['path'])
+            for _ in range(max(options['runs'], 1))
+        ]
+        report = {
+            'path': options['path'],
+            'status': runs[-1][0]['status'],
+            'runs': len(runs),
+            **summarize(runs),
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(report, options['top'])
+        self.stdout.write(f'JSON: {options["output"]}')
+
+    def print_report(self, report, top):
+        self.stdout.write(
+            f'Холодный старт {report["total_ms"]:.0f} мс, медиана '
+            f'{report["runs"]} запусков (ответ {report["status"]} '
+            f'на {report["path"]})'
+        )
+        self.stdout.write('Фазы:')
+        for name, value in sorted(
+            report['phases_ms'].items(), key=lambda item: -item[1]
+        ):
+            self.stdout.write(f'  {name:<16} {value:8.1f} мс')
+        self.stdout.write('Пакеты, собственное время импорта:')
+        for name, value in list(report['packages_ms'].items())[:top]:
+            self.stdout.write(f'  {name:<32} {value:8.1f} мс')
+        self.stdout.write('Модули, собственное время импорта:')
+        for module in report['modules'][:top]:
+            self.stdout.write(
+                f'  {module["module"]:<48} {module["self_ms"]:8.1f} мс '
+                f'(всего {module["cumulative_ms"]:.1f})'
+            )
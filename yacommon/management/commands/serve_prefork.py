@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from yacommon import prefork
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает сервер с предварительным fork: приложение, URL-резолвер '
+        'и шаблоны прогреваются один раз в мастере, воркеры получают их '
+        'копированием при записи. HUP — плавная перезагрузка, TERM — '
+        'плавная остановка.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'addrport', nargs='?', default='127.0.0.1:8000',
+            help='Адрес и порт, по умолчанию 127.0.0.1:8000.'
+        )
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--graceful-timeout', type=float, default=30,
+            help='Сколько секунд ждать воркеров при остановке.'
+        )
+        parser.add_argument(
+            '--ready-file',
+            help='Файл, в который пишется pid мастера, когда все воркеры '
+                 'готовы принимать запросы.'
+        )
+
+    def handle(self, *args, **options):
+        host, _, port = options['addrport'].rpartition(':')
+        if not port.isdigit() or options['workers'] < 1:
+            raise CommandError('Укажите адрес как host:port и --workers > 0.')
+        application, compiled, cached = prefork.warm_up()
+        self.stdout.write(f'Скомпилировано шаблонов: {compiled}')
+        if not cached:
+            self.stderr.write(
+                'Кеширующий загрузчик шаблонов выключен (DEBUG=True): '
+                'воркеры будут перечитывать шаблоны.'
+            )
+        sock = prefork.listen(host or '127.0.0.1', int(port))
+        master = prefork.Master(
+            application, sock, options['workers'],
+            options['graceful_timeout'], options['ready_file'],
+            log=lambda message: self.stdout.write(message),
+        )
+        master.run()
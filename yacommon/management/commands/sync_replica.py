@@ -0,0 +1,39 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в базу-реплику. Заменяет '
+        'репликацию при локальной проверке чтения с реплики.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--replica', default=settings.DATABASE_REPLICA or 'replica',
+            help='Имя базы-реплики из DATABASES.'
+        )
+
+    def handle(self, *args, **options):
+        replica = options['replica']
+        if replica not in settings.DATABASES or replica == DEFAULT_DB_ALIAS:
+            raise CommandError(f'Нет базы-реплики {replica!r} в DATABASES.')
+        databases = (DEFAULT_DB_ALIAS, replica)
+        for alias in databases:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError('Копирование поддерживается для SQLite.')
+        connections[replica].close()
+        source, target = (
+            sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            for alias in databases
+        )
+        try:
+            # backup даёт согласованную копию и при одновременной записи.
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        self.stdout.write(self.style.SUCCESS(f'Реплика {replica} обновлена.'))
@@ -0,0 +1,88 @@
+import asyncio
+import functools
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from . import auth, profiling, routers
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class PrimaryPinMiddleware(MiddlewareMixin):
+    """
+    Закрепляет пользователя за основной базой после его записи.
+
+    Метка хранится в подписанной cookie с временем жизни
+    DATABASE_PRIMARY_PIN_SECONDS, поэтому сервер ничего не запоминает.
+    """
+
+    def process_request(self, request):
+        pinned = request.method not in SAFE_METHODS or bool(
+            request.get_signed_cookie(
+                PIN_COOKIE, default=None,
+                max_age=settings.DATABASE_PRIMARY_PIN_SECONDS
+            )
+        )
+        request.db_state = routers.begin_request(pinned)
+
+    def process_response(self, request, response):
+        state = getattr(request, 'db_state', None)
+        if state is None:
+            return response
+        routers.end_request()
+        if state.wrote or request.method not in SAFE_METHODS:
+            response.set_signed_cookie(
+                PIN_COOKIE, '1',
+                max_age=settings.DATABASE_PRIMARY_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware, читающий пользователя из кеша."""
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: auth.get_user(request))
+        # Для асинхронных представлений, как request.auser в Django 5.0.
+        request.auser = functools.partial(auth.aget_user, request)
+
+
+class RequestProfileMiddleware:
+    """
+    Профилирует запрос по токену в заголовке X-Profile или по доле
+    REQUEST_PROFILE_SAMPLE_RATE; остальные запросы проходят без
+    накладных расходов. Без REQUEST_PROFILE_DIR не подключается.
+
+    Работает и синхронно, и асинхронно: под ASGI стоящий первым
+    синхронный middleware перевёл бы всю цепочку в пул потоков.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.REQUEST_PROFILE_DIR is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django узнаёт асинхронный экземпляр, как у MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not profiling.is_requested(request):
+            return self.get_response(request)
+        return profiling.profile(request, self.get_response)
+
+    async def __acall__(self, request):
+        if not profiling.is_requested(request):
+            return await self.get_response(request)
+        return await profiling.aprofile(request, self.get_response)
@@ -0,0 +1,117 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+AFTER = 'after'
+BEFORE = 'before'
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+class KeysetPage:
+    """Страница выдачи с курсорами на соседние страницы."""
+
+    def __init__(self, object_list, after=None, before=None):
+        self.object_list = object_list
+        self.after = after
+        self.before = before
+
+    def has_other_pages(self):
+        return bool(self.after or self.before)
+
+
+class KeysetPaginator:
+    """
+    Постраничный вывод по курсору (keyset pagination).
+
+    Вместо OFFSET страница выбирается условием «строго после ключа»
+    по полям сортировки, поэтому любая страница стоит один запрос
+    по индексу независимо от того, как далеко пролистал читатель.
+    Последнее поле сортировки должно быть уникальным (обычно id).
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj):
+        values = [
+            field.value_to_string(obj) for field in self.fields
+        ]
+        return urlsafe_base64_encode(json.dumps(values).encode())
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(urlsafe_base64_decode(cursor))
+            if len(values) != len(self.fields):
+                raise ValueError
+            return [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise Http404('Некорректный курсор страницы.')
+
+    def _filter_after(self, ordering, values):
+        """Условие «строго после ключа» для заданной сортировки."""
+        conditions = []
+        for index, name in enumerate(ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            equal = {
+                field.name: value
+                for field, value in zip(self.fields[:index], values)
+            }
+            equal[f'{self.fields[index].name}__{lookup}'] = values[index]
+            conditions.append(Q(**equal))
+        # Нестрогая граница по первому полю позволяет базе начать
+        # чтение индекса сразу с нужного места, а не фильтровать его
+        # с начала.
+        lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+        bound = Q(**{f'{self.fields[0].name}__{lookup}': values[0]})
+        return bound & reduce(or_, conditions)
+
+    def get_page(self, params):
+        """Страница по курсору из параметров запроса (after или before)."""
+        if params.get(BEFORE):
+            return self.page(params[BEFORE], BEFORE)
+        return self.page(params.get(AFTER), AFTER)
+
+    def page(self, cursor=None, direction=AFTER):
+        """Возвращает страницу после (или перед) курсором."""
+        ordering = self.ordering
+        if direction == BEFORE:
+            ordering = _reverse_ordering(ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if cursor:
+            values = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._filter_after(ordering, values))
+        # Лишняя строка показывает, есть ли что-то за этой страницей.
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if direction == BEFORE:
+            object_list.reverse()
+            has_after, has_before = bool(cursor), has_more
+        else:
+            has_after, has_before = has_more, bool(cursor)
+        if not object_list:
+            return KeysetPage(object_list)
+        return KeysetPage(
+            object_list,
+            after=self.encode_cursor(object_list[-1]) if has_after else None,
+            before=self.encode_cursor(object_list[0]) if has_before else None,
+        )
@@ -0,0 +1,259 @@
+"""
+Сервер с предварительным fork: прогрев один раз, затем N процессов.
+
+Мастер загружает приложение, заполняет URL-резолвер и компилирует
+шаблоны проекта, проверяет соединения с базами и только после этого
+порождает воркеров: прогретая память достаётся им копированием при
+записи. Соединения с базой через fork не передаются (SQLite этого не
+допускает), поэтому каждый воркер открывает свои до приёма запросов.
+
+Сигналы мастеру: TERM/INT — плавная остановка, HUP — плавная
+перезагрузка. При перезагрузке запускается новый мастер с тем же
+сокетом и свежим кодом; когда его воркеры готовы, он останавливает
+старый мастер, поэтому сокет не закрывается ни на миг.
+"""
+import atexit
+import gc
+import os
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+
+from django.conf import settings
+from django.core.servers.basehttp import (
+    WSGIRequestHandler, WSGIServer, get_internal_wsgi_application
+)
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+from django.urls import URLResolver, get_resolver
+
+# Через окружение новый мастер получает сокет и pid старого мастера.
+LISTEN_FD_ENV = 'PREFORK_LISTEN_FD'
+PARENT_PID_ENV = 'PREFORK_PARENT_PID'
+# Как часто воркер проверяет, не пора ли остановиться, секунды.
+POLL_INTERVAL = 0.5
+
+
+def _populate(resolver):
+    # reverse_dict заполняет резолвер, вложенные заполняются отдельно.
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            _populate(pattern)
+
+
+def compile_templates():
+    """Компилирует шаблоны проекта; возвращает их число и признак кеша."""
+    compiled = 0
+    cached = True
+    for engine in engines.all():
+        loaders = getattr(engine, 'engine', None)
+        cached = cached and loaders is not None and any(
+            isinstance(loader, CachedLoader)
+            for loader in loaders.template_loaders
+        )
+        for directory in map(Path, engine.template_dirs):
+            # Шаблоны django.contrib не нужны на первых запросах.
+            if settings.BASE_DIR not in directory.parents:
+                continue
+            for path in directory.rglob('*.html'):
+                engine.get_template(path.relative_to(directory).as_posix())
+                compiled += 1
+    return compiled, cached
+
+
+def _used_connections():
+    aliases = (DEFAULT_DB_ALIAS, settings.DATABASE_REPLICA)
+    return [connections[alias] for alias in aliases if alias is not None]
+
+
+def warm_up():
+    """Загружает приложение и прогревает всё, что переживёт fork."""
+    application = get_internal_wsgi_application()
+    _populate(get_resolver())
+    compiled, cached = compile_templates()
+    # Проверяем, что базы доступны, до запуска воркеров.
+    for connection in _used_connections():
+        connection.ensure_connection()
+    connections.close_all()
+    return application, compiled, cached
+
+
+def listen(host, port):
+    inherited = os.environ.pop(LISTEN_FD_ENV, None)
+    if inherited is not None:
+        sock = socket.socket(fileno=int(inherited))
+    else:
+        sock = socket.create_server((host, port), backlog=1024)
+    # Сокет общий: неудачный accept в одном воркере не должен его вешать.
+    sock.setblocking(False)
+    return sock
+
+
+def notify_systemd(message):
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return
+    if address.startswith('@'):
+        address = '\0' + address[1:]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.sendto(message.encode(), address)
+
+
+class Worker:
+    """Обслуживает запросы по одному, пока мастер не попросит выйти."""
+
+    def __init__(self, application, sock, ready_fd):
+        self.application = application
+        self.sock = sock
+        self.ready_fd = ready_fd
+        self.stopping = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        host, port = self.sock.getsockname()[:2]
+        server = WSGIServer(
+            (host, port), WSGIRequestHandler, bind_and_activate=False
+        )
+        server.socket.close()
+        server.socket = self.sock
+        server.server_name = socket.getfqdn(host)
+        server.server_port = port
+        server.setup_environ()
+        server.set_app(self.application)
+        server.timeout = POLL_INTERVAL
+        for connection in _used_connections():
+            connection.ensure_connection()
+        os.write(self.ready_fd, b'1')
+        os.close(self.ready_fd)
+        while not self.stopping:
+            server.handle_request()
+        connections.close_all()
+
+    def stop(self, signum, frame):
+        # Текущий запрос дообслуживается, новые не принимаются.
+        self.stopping = True
+
+
+class Master:
+
+    def __init__(self, application, sock, workers, graceful_timeout,
+                 ready_file, log):
+        self.application = application
+        self.sock = sock
+        self.workers_count = workers
+        self.graceful_timeout = graceful_timeout
+        self.ready_file = ready_file
+        self.log = log
+        self.workers = set()
+        self.stopping = False
+        self.ready_read, self.ready_write = os.pipe()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.reload)
+        # Объекты прогрева больше не меняются: сборщик мусора не будет
+        # трогать их страницы, и они останутся общими после fork.
+        gc.freeze()
+        for _ in range(self.workers_count):
+            self.spawn()
+        self.wait_ready()
+        while not self.stopping:
+            self.reap(respawn=True)
+            time.sleep(POLL_INTERVAL)
+        self.shutdown()
+
+    def spawn(self):
+        pid = os.fork()
+        if pid:
+            self.workers.add(pid)
+            return
+        exit_code = 0
+        try:
+            os.close(self.ready_read)
+            Worker(self.application, self.sock, self.ready_write).run()
+        except BaseException:
+            exit_code = 1
+            traceback.print_exc()
+        finally:
+            # Воркер не должен возвращаться в код мастера, а os._exit
+            # пропускает atexit: обработчики, например запись очереди
+            # комментариев, вызываются явно.
+            atexit._run_exitfuncs()
+            os._exit(exit_code)
+
+    def wait_ready(self):
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.ready_read, selectors.EVENT_READ)
+            ready = 0
+            while ready < self.workers_count and not self.stopping:
+                if selector.select(timeout=POLL_INTERVAL):
+                    ready += len(os.read(self.ready_read, 1024))
+                self.reap(respawn=True)
+        if self.stopping:
+            return
+        host, port = self.sock.getsockname()[:2]
+        self.log(f'Готов: {self.workers_count} воркеров на {host}:{port}')
+        if self.ready_file:
+            Path(self.ready_file).write_text(str(os.getpid()))
+        notify_systemd(f'MAINPID={os.getpid()}\nREADY=1')
+        parent = os.environ.pop(PARENT_PID_ENV, None)
+        if parent is not None:
+            os.kill(int(parent), signal.SIGTERM)
+
+    def reap(self, respawn):
+        while self.workers:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if pid not in self.workers:
+                continue
+            self.workers.discard(pid)
+            if respawn and not self.stopping:
+                self.log(f'Воркер {pid} завершился, запускаю новый')
+                self.spawn()
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def reload(self, signum, frame):
+        self.log('Перезагрузка: запускаю новый мастер')
+        fd = self.sock.fileno()
+        os.set_inheritable(fd, True)
+        subprocess.Popen(
+            [sys.executable, *sys.argv],
+            env={
+                **os.environ,
+                LISTEN_FD_ENV: str(fd),
+                PARENT_PID_ENV: str(os.getpid()),
+            },
+            pass_fds=(fd,),
+        )
+
+    def shutdown(self):
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap(respawn=False)
+            time.sleep(0.1)
+        for pid in self.workers:
+            os.kill(pid, signal.SIGKILL)
+        self.reap(respawn=False)
+        if self.ready_file and Path(self.ready_file).exists() and (
+            Path(self.ready_file).read_text() == str(os.getpid())
+        ):
+            Path(self.ready_file).unlink()
+        self.log('Остановлен')
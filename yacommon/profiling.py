@@ -0,0 +1,248 @@
+"""
+Профилирование отдельных запросов.
+
+Запрос профилируется, если в заголовке X-Profile пришёл токен из
+make_token() или он попал в долю REQUEST_PROFILE_SAMPLE_RATE. Пока
+запрос обрабатывается, отдельный поток снимает стек обрабатывающего
+потока, а все запросы к базе замеряются. В REQUEST_PROFILE_DIR
+пишутся два файла:
+    <id>.folded — свёрнутые стеки для flamegraph.pl или speedscope;
+    <id>.json — длительность запроса и самые долгие SQL-запросы.
+Когда каталог превышает REQUEST_PROFILE_MAX_BYTES, старые профили
+удаляются. Под ASGI в профиль попадают синхронная часть запроса и
+работа в пуле executor; сопрограммы в цикле событий — нет.
+"""
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_PROFILE'
+RESPONSE_HEADER = 'X-Profile-Id'
+SALT = 'request-profile'
+
+# Сэмплер и журнал SQL профилируемого запроса.
+_current = ContextVar('request_profile', default=None)
+
+
+def make_token():
+    """Подписанный токен для заголовка X-Profile."""
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def is_requested(request):
+    token = request.META.get(HEADER)
+    if token is None:
+        rate = settings.REQUEST_PROFILE_SAMPLE_RATE
+        return bool(rate) and random.random() < rate
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            token, max_age=settings.REQUEST_PROFILE_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _label(frame):
+    return f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}'
+
+
+class Sampler(threading.Thread):
+    """Считает стеки подключённых потоков над их кадрами root."""
+
+    def __init__(self, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.interval = interval
+        self.roots = {}
+        self.stacks = Counter()
+        self.finished = threading.Event()
+
+    def attach(self, thread_id, root):
+        self.roots[thread_id] = root
+
+    def detach(self, thread_id):
+        self.roots.pop(thread_id, None)
+
+    def run(self):
+        while not self.finished.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, root in list(self.roots.items()):
+                self._sample(frames.get(thread_id), root)
+
+    def _sample(self, frame, root):
+        stack = []
+        while frame is not None and frame is not root:
+            stack.append(_label(frame))
+            frame = frame.f_back
+        # Без кадра root поток уже вышел из работы над запросом.
+        if frame is not None and stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+class QueryLog:
+    """Обёртка execute_wrapper: число и время выполнения SQL по тексту."""
+
+    def __init__(self):
+        self.queries = defaultdict(lambda: {'count': 0, 'total': 0, 'max': 0})
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            query = self.queries[(context['connection'].alias, sql)]
+            query['count'] += 1
+            query['total'] += duration
+            query['max'] = max(query['max'], duration)
+
+    def summary(self, top):
+        queries = sorted(
+            self.queries.items(), key=lambda item: -item[1]['total']
+        )
+        return [
+            {
+                'alias': alias,
+                'sql': sql,
+                'count': query['count'],
+                'total_ms': query['total'] * 1000,
+                'max_ms': query['max'] * 1000,
+            }
+            for (alias, sql), query in queries[:top]
+        ]
+
+
+def prune(directory, max_bytes):
+    """Удаляет самые старые профили, пока каталог больше max_bytes."""
+    files = sorted(
+        (path.stat().st_mtime, path.stat().st_size, path)
+        for path in directory.iterdir() if path.is_file()
+    )
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= max_bytes:
+            break
+        # Профиль мог удалить соседний процесс.
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def _write(profile_id, request, response, duration, sampler, log):
+    directory = settings.REQUEST_PROFILE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f'{profile_id}.folded').write_text(''.join(
+        f'{stack} {count}\n' for stack, count in sampler.stacks.items()
+    ))
+    queries = log.queries.values()
+    report = {
+        'method': request.method,
+        'path': request.get_full_path(),
+        'status': response.status_code,
+        'duration_ms': duration * 1000,
+        'samples': sum(sampler.stacks.values()),
+        'interval_ms': sampler.interval * 1000,
+        'queries_count': sum(query['count'] for query in queries),
+        'queries_ms': sum(query['total'] for query in queries) * 1000,
+        'top_queries': log.summary(settings.REQUEST_PROFILE_TOP_QUERIES),
+    }
+    with open(directory / f'{profile_id}.json', 'w') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    prune(directory, settings.REQUEST_PROFILE_MAX_BYTES)
+
+
+@contextmanager
+def attach(root):
+    """
+    Подключает текущий поток к профилю запроса, если он идёт.
+
+    SQL потока и его стеки над кадром root попадают в профиль. Профиль
+    передаётся через ContextVar, поэтому его видят потоки sync_to_async
+    и пула executor, куда запрос уходит под ASGI.
+    """
+    current = _current.get()
+    thread_id = threading.get_ident()
+    if current is None or thread_id in current[0].roots:
+        yield
+        return
+    sampler, log = current
+    sampler.attach(thread_id, root)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(log))
+            yield
+    finally:
+        sampler.detach(thread_id)
+
+
+def _finish(profile_id, request, response, duration, sampler, log):
+    try:
+        _write(profile_id, request, response, duration, sampler, log)
+    except OSError:
+        # Профиль не должен ломать сам запрос.
+        logger.exception('Не удалось сохранить профиль %s', profile_id)
+        return response
+    response[RESPONSE_HEADER] = profile_id
+    return response
+
+
+def _new_id():
+    return f'{time.strftime("%Y%m%d-%H%M%S")}-{uuid.uuid4().hex[:8]}'
+
+
+def profile(request, get_response):
+    """Обрабатывает запрос под профилировщиком и сохраняет профиль."""
+    profile_id = _new_id()
+    log = QueryLog()
+    sampler = Sampler(settings.REQUEST_PROFILE_INTERVAL)
+    token = _current.set((sampler, log))
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        with attach(sys._getframe()):
+            response = get_response(request)
+    finally:
+        sampler.stop()
+        _current.reset(token)
+    duration = time.perf_counter() - started
+    return _finish(profile_id, request, response, duration, sampler, log)
+
+
+def _profile_async(request, get_response):
+    try:
+        return profile(request, async_to_sync(get_response))
+    finally:
+        # Поток живёт дольше запроса, как и потоки пула executor.
+        close_old_connections()
+
+
+async def aprofile(request, get_response):
+    """
+    Асинхронный вариант profile() для цепочки middleware под ASGI.
+
+    Цепочка запускается из отдельного потока через async_to_sync:
+    синхронные middleware и представления asgiref выполняет в этом же
+    потоке, поэтому они попадают в профиль, как под WSGI. Цикл событий
+    профилировщик не трогает.
+    """
+    return await sync_to_async(_profile_async, thread_sensitive=False)(
+        request, get_response
+    )
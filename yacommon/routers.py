@@ -0,0 +1,70 @@
+"""
+Чтение с реплики, запись в основную базу.
+
+Модели приложений DATABASE_REPLICA_APPS читаются из DATABASE_REPLICA,
+если запрос не закреплён за основной базой. Закрепляют запрос
+изменяющий метод, запись в базу и метка недавней записи от
+PrimaryPinMiddleware: пользователь сразу видит свои изменения, даже
+если реплика ещё не догнала основную базу.
+"""
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RequestState:
+    """Состояние текущего запроса; общее для всех потоков запроса."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_state = ContextVar('db_state', default=None)
+
+
+def begin_request(pinned=False):
+    """Начинает учёт запроса в текущем контексте и возвращает состояние."""
+    state = RequestState(pinned)
+    _state.set(state)
+    return state
+
+
+def end_request():
+    _state.set(None)
+
+
+def _use_primary():
+    state = _state.get()
+    if state is not None and (state.pinned or state.wrote):
+        return True
+    # Внутри транзакции читаем то, что в ней же записано.
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replica = settings.DATABASE_REPLICA
+        if replica is None or (
+            model._meta.app_label not in settings.DATABASE_REPLICA_APPS
+        ):
+            return None
+        return DEFAULT_DB_ALIAS if _use_primary() else replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема на реплику приходит вместе с копией данных.
+        if db == settings.DATABASE_REPLICA:
+            return False
+        return None
@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import auth
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_cached_user(sender, instance, **kwargs):
+    auth.invalidate(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_cached_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        auth.invalidate(user.pk)
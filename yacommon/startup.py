@@ -0,0 +1,67 @@
+"""
+Замер холодного старта по фазам.
+
+Запускается командой profile_startup в отдельном процессе под
+python -X importtime, поэтому до начала замера модуль не импортирует
+ничего, кроме стандартной библиотеки.
+"""
+import io
+import json
+import sys
+import time
+
+HOST = '127.0.0.1'
+
+
+def _get(handler, path):
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'HTTP_HOST': HOST,
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+    }
+    statuses = []
+    response = handler(
+        environ, lambda status, headers: statuses.append(status)
+    )
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+def main(path):
+    phases = {}
+    last = time.perf_counter()
+
+    def phase(name):
+        nonlocal last
+        now = time.perf_counter()
+        phases[name] = (now - last) * 1000
+        last = now
+
+    import django
+    from django.conf import settings
+    settings.INSTALLED_APPS
+    phase('settings')
+    # Импорт приложений и моделей, ready(), в том числе autodiscover админки.
+    django.setup()
+    phase('apps')
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+    phase('urlconf')
+    from django.core.handlers.wsgi import WSGIHandler
+    handler = WSGIHandler()
+    phase('middleware')
+    status = _get(handler, path)
+    phase('first_request')
+    _get(handler, path)
+    phase('second_request')
+    json.dump({'phases': phases, 'status': status}, sys.stdout)
@@ -0,0 +1,10 @@
+from django.conf import settings
+
+from yacommon import prefork
+
+
+def test_prefork_compiles_project_templates():
+    compiled, cached = prefork.compile_templates()
+    templates = list((settings.BASE_DIR / 'templates').rglob('*.html'))
+    assert compiled == len(templates)
+    assert cached is not settings.DEBUG
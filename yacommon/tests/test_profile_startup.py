@@ -0,0 +1,25 @@
+from yacommon.management.commands import profile_startup
+
+IMPORT_TIME = (
+    'import time: self [us] | cumulative | imported package\n'
+    'import time:       200 |        200 |   yacommon.sqlite\n'
+    'import time:      1000 |       1200 | yacommon.signals\n'
+)
+
+
+def test_profile_startup_summarizes_runs():
+    modules = profile_startup.parse_import_times(IMPORT_TIME)
+    assert modules['yacommon.sqlite']['depth'] == 1
+    slower = {**modules, 'yacommon.signals': {
+        **modules['yacommon.signals'], 'self_ms': 3.0
+    }}
+    report = profile_startup.summarize([
+        ({'phases': {'apps': 10.0}}, modules),
+        ({'phases': {'apps': 30.0}}, slower),
+        ({'phases': {'apps': 20.0}}, modules),
+    ])
+    assert report['phases_ms'] == {'apps': 20.0}
+    assert [item['module'] for item in report['modules']] == [
+        'yacommon.signals', 'yacommon.sqlite'
+    ]
+    assert report['packages_ms'] == {'yacommon': 1.2}